@@ -1,5 +1,5 @@
 from PIL import Image, ImageDraw
-from multiprocessing import Process, Queue
+from multiprocessing import Process, Queue, get_all_start_methods, get_context
 
 import aggdraw
 import numpy as np
@@ -10,14 +10,34 @@ import copy
 import json
 import math
 
+import reference_cache
+
+# Default population size
 PROCESSING = 8
+# Default amount of worker processes, one per core this process may run on
+WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
 ISOLATION_CYCLES = 1
 
 GRADIENT_THRESHHOLD = 75
 
+# "aggdraw" or "numpy", see rasterizer.py
+RENDER_BACKEND = os.environ.get("RENDER_BACKEND", "aggdraw")
+
+if RENDER_BACKEND not in ("aggdraw", "numpy"):
+    raise ValueError(f"Unknown render backend {RENDER_BACKEND}")
+
+# Shared by all array based random operations
+RNG = np.random.default_rng()
+
 NOW = datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
 
-# np.sum(np.abs(ref_data - data) / 255)
+def get_fork_context():
+    # Strategies bind the class attributes of their DNA at run time, only forked workers inherit them. Spawned workers,
+    # like the forkserver default of Python 3.14 or spawn on macOS and Windows, import the modules again without them
+    if "fork" not in get_all_start_methods():
+        raise RuntimeError("Worker processes have to be forked, which this platform doesn't support")
+
+    return get_context("fork")
 
 create_dir_name = lambda name: "./" + name + "_" + NOW
 
@@ -28,6 +48,7 @@ def save_metadata(dir, metadata):
 class BaseUtils:
     def __init__(self, colors, points_amount):
         self.colors = colors
+        self.palette = np.array(colors, dtype=np.uint8).reshape((-1, 3))
         self.points_amount = points_amount
 
     def generate_color(self):
@@ -37,23 +58,20 @@ class BaseUtils:
     def get_color_index(self, x, y):
         return (x - 1) * 2 + (y - 1) * (self.points_amount - 1) * 2
 
+    def generate_colors(self, amount):
+        return RNG.integers(0x33, 0xcc, (amount, 3), endpoint=True).astype(np.uint8)
+
     @staticmethod
     def generate_color_entry():
         return random.randint(0x33, 0xcc)
 
-    @staticmethod
-    def fitness_func(ref_data, data):
-        return np.sum(np.maximum(50 * np.power(1.02, -np.abs(ref_data - data)), 0)) * 0.000001
-
     @staticmethod
     def get_image_values(image_path):
-        reference = Image.open(image_path)
-        image_size = reference.size
-        reference_data = reference.getdata()
-
-        colors = list(set(reference_data))
+        # (H, W, 3) uint8, the layout rendered images have, mapped from the cache next to the image
+        reference, colors = reference_cache.load(image_path)
+        image_size = (reference.shape[1], reference.shape[0])
 
-        return np.array(reference_data).transpose(), image_size, colors
+        return reference, image_size, [tuple(color) for color in colors.tolist()]
 
     @staticmethod
     def get_distance_between_points(points_amount, image_size):
@@ -62,6 +80,25 @@ class BaseUtils:
             image_size[1] / (points_amount - 1)
         )
 
+    @staticmethod
+    def get_triangles(points_amount):
+        # Vertex indices of every triangle, indexed by color index in the order DNA.draw paints them
+        triangles = [None] * ((points_amount - 1) * 2 * (points_amount - 1))
+
+        for i in range(points_amount * points_amount):
+            x_index = i % points_amount
+            y_index = int(i / points_amount)
+
+            if x_index <= 0 or y_index <= 0:
+                continue
+
+            color_index = (x_index - 1) * 2 + (y_index - 1) * (points_amount - 1) * 2
+
+            triangles[color_index] = (i, i - 1, i - points_amount - 1)
+            triangles[color_index + 1] = (i, i - points_amount, i - points_amount - 1)
+
+        return np.array(triangles)
+
     @staticmethod
     def reduce_color_amount(colors):
         colors.sort(key=lambda c: c[2] + c[1] * 1000 + c[0] * 1000000)
@@ -83,8 +120,6 @@ class BaseUtils:
 
         color_values = []
 
-        print(len(clusters))
-
         for c in clusters:
             mean_color = list(map(int, list(np.mean(np.array(c), axis=0))))
 
@@ -92,37 +127,51 @@ class BaseUtils:
 
         return color_values
 
-class Point:
-    def __init__(self, index, points_amount, distance_between_points):
-        self.index = index
+class PaletteUtils(BaseUtils):
+    # Colors are picked from the given colors instead of the whole range
+    def generate_color(self):
+        return self.palette[RNG.integers(len(self.palette))]
+
+    def generate_colors(self, amount):
+        return self.palette[RNG.integers(len(self.palette), size=amount)]
+
+# Constants of the point grid, shared by all DNA which only store the offset of every point from its base position
+class Grid:
+    def __init__(self, points_amount, image_size):
         self.points_amount = points_amount
-        self.distance_between_points = distance_between_points
+        self.image_size = image_size
+        self.distance_between_points = BaseUtils.get_distance_between_points(points_amount, image_size)
+
+        index = np.arange(points_amount * points_amount)
+
+        self.x_index = index % points_amount
+        self.y_index = index // points_amount
 
-        self.x_index = index % self.points_amount
-        self.y_index = int(index / self.points_amount)
+        self.base_positions = np.stack([
+            self.x_index * self.distance_between_points[0],
+            self.y_index * self.distance_between_points[1]
+        ], axis=1)
 
-        self.base_pos_x = self.x_index * self.distance_between_points[0]
-        self.base_pos_y = self.y_index * self.distance_between_points[1]
+        # Points move up to 40% of the distance to their neighbours, points on the border stay on it
+        self.mutation_range = np.array([0.8 * i for i in self.distance_between_points], dtype=np.float32)
+        self.movable = np.stack([
+            (self.x_index > 0) & (self.x_index < points_amount - 1),
+            (self.y_index > 0) & (self.y_index < points_amount - 1)
+        ], axis=1)
 
-        self.distance_between_points = [0.8 * i for i in self.distance_between_points]
+        self.triangles = BaseUtils.get_triangles(points_amount)
+        self.points_count = points_amount * points_amount
+        self.triangle_count = len(self.triangles)
 
-        self.pos_x = self.base_pos_x
-        self.pos_y = self.base_pos_y
+    def mutate(self, offsets, indices):
+        jitter = (RNG.random((len(indices), 2), dtype=np.float32) - 0.5) * self.mutation_range
+        offsets[indices] = np.where(self.movable[indices], jitter, offsets[indices])
 
-    def mutate(self):
-        if not self.x_index == self.points_amount - 1 and not self.x_index == 0:
-            self.pos_x = (
-                self.base_pos_x 
-                - (self.distance_between_points[0] / 2) 
-                + random.uniform(0, self.distance_between_points[0])
-            )
+    def clip(self, offsets):
+        # Keeps points within the range mutations could have moved them
+        limit = self.mutation_range / 2
 
-        if not self.y_index == self.points_amount - 1 and not self.y_index == 0:
-            self.pos_y = (
-                self.base_pos_y 
-                - (self.distance_between_points[1] / 2) 
-                + random.uniform(0, self.distance_between_points[1])    
-            )
+        return np.where(self.movable, np.clip(offsets, -limit, limit), 0).astype(np.float32)
 
-    def coord(self):
-        return (self.pos_x, self.pos_y)
\ No newline at end of file
+    def coords(self, offsets):
+        return self.base_positions + offsets
@@ -0,0 +1,211 @@
+from collections import deque
+
+import argparse
+import json
+import time
+import os
+
+from base_classes import create_dir_name, save_metadata, Grid
+from color_solver import ColorSolver, SolvedColorDNA
+from evaluation_pool import EvaluationPool
+from experiment import Experiment
+from fitness_kernels import KERNELS
+from runner import Run, create_strategy, create_run_dir, load_config
+from writers import LogWriter
+
+import reference_cache
+import timings
+
+"""
+    - Runs a catalogue of reference images in one process tree, every image is a job and all jobs share one pool
+    - Jobs come from a directory (every image in it with the same settings) or a JSON manifest
+      {"defaults": {...}, "jobs": ["a.jpg", {"image": "b.jpg", "points_amount": 30, "epochs": 5000}, ...]},
+      a job overrides config keys of experiment.py like strategy, points_amount and the stop criteria
+    - Every job needs a stop criterion (epochs, target_fitness or max_seconds), levels and islands start processes of
+      their own and can't run in a batch
+    - At most active jobs run at once, the next slice of slice_seconds goes to the active job that ran the shortest
+      time, a job starts at the least time of the running ones, so it doesn't get all slices until it caught up
+    - Before a slice the strategy binds its classes again, workers bind theirs with the JobBinding sent with every task
+    - Every job writes into its own run directory in the batch directory, which runner.py --resume can continue
+    - batch.csv gets a line per finished job, throughput in images per hour is printed whenever a job finishes
+    - python batch.py DIR|manifest.json [--config defaults.json] [--active 4] [--slice 1] [--workers N]
+"""
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+ACTIVE_JOBS = 4
+SLICE_SECONDS = 1
+
+class JobBinding:
+    # What a worker needs to evaluate the DNA of a job, the reference is mapped from the cache the master filled
+    def __init__(self, key, config):
+        self.key = key
+        self.image = config["image"]
+        self.points_amount = config["points_amount"]
+        self.kernel = config["kernel"]
+        self.color_solve = config["color_solve"]
+
+    def apply(self, dna_class):
+        reference, _ = reference_cache.load(self.image)
+
+        dna_class.reference = reference
+        dna_class.kernel = KERNELS[self.kernel]
+        dna_class.grid = Grid(self.points_amount, (reference.shape[1], reference.shape[0]))
+
+        if issubclass(dna_class, SolvedColorDNA):
+            dna_class.solver = ColorSolver(reference, dna_class.grid, dna_class.kernel, self.color_solve)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="directory of reference images or JSON manifest of jobs")
+    parser.add_argument("--config", help="JSON config every job starts from, before the defaults of a manifest")
+    parser.add_argument("--active", type=int, default=ACTIVE_JOBS, help="jobs running at the same time")
+    parser.add_argument("--slice", type=float, default=SLICE_SECONDS, help="seconds a job runs before the next one")
+    parser.add_argument("--workers", type=int, help="worker processes of the shared pool, one per core by default")
+
+    return parser.parse_args()
+
+def load_jobs(source, defaults):
+    # Config of every job, images of a manifest are relative to it
+    if os.path.isdir(source):
+        jobs = [
+            {"image": os.path.join(source, name)} for name in sorted(os.listdir(source))
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith(".")
+        ]
+    else:
+        with open(source) as file:
+            manifest = json.load(file)
+
+        directory = os.path.dirname(os.path.abspath(source))
+        defaults = {**defaults, **manifest.get("defaults", {})}
+        jobs = [job if isinstance(job, dict) else {"image": job} for job in manifest["jobs"]]
+        jobs = [{**job, "image": os.path.join(directory, job["image"])} for job in jobs]
+
+    configs = []
+    names = set()
+
+    for job in jobs:
+        config = {**defaults, **job}
+        name = base = config.get("name") or os.path.splitext(os.path.basename(config["image"]))[0]
+        index = 1
+
+        while name in names:
+            index += 1
+            name = f"{base}_{index}"
+
+        names.add(name)
+        configs.append({**config, "name": name})
+
+    return configs
+
+def check_job(config):
+    # Fails on a bad job before any job started
+    config = Experiment(config).config
+
+    if config["epochs"] is None and config["target_fitness"] is None and config["max_seconds"] is None:
+        raise ValueError(f"Job {config['name']} has no stop criterion")
+
+    if config["levels"] > 1 or config["islands"]:
+        raise ValueError(f"Job {config['name']} uses levels or islands, which can't share the pool of a batch")
+
+class Job:
+    def __init__(self, config, dir, pool, offset):
+        self.experiment = Experiment(config)
+        self.config = self.experiment.config
+        self.strategy, _ = create_strategy(self.experiment)
+        self.binding = JobBinding(dir, self.config)
+        self.start = time.time()
+        # Time of a job is counted from the least time of the jobs running when it started
+        self.offset = offset
+
+        create_run_dir(dir, self.experiment, self.experiment.timings)
+        self.run = Run(self.experiment, self.strategy, pool, dir, verbose=False)
+
+    @property
+    def time(self):
+        return self.offset + self.run.seconds
+
+    def activate(self, pool):
+        self.strategy.activate()
+        pool.binding = self.binding
+
+def run_batch(configs, dir, active=ACTIVE_JOBS, slice_seconds=SLICE_SECONDS, workers=None, shared=True):
+    for config in configs:
+        check_job(config)
+
+    os.mkdir(dir)
+
+    settings = {"jobs": configs, "active": active, "slice_seconds": slice_seconds, "workers": workers}
+    save_metadata(dir, settings)
+
+    # Before the pool forks its workers
+    timings.enabled = any(config.get("timings", False) for config in configs)
+
+    queue = deque(configs)
+    running = []
+    finished = 0
+    current = None
+    start = time.time()
+
+    with EvaluationPool(workers, shared) as pool, LogWriter(dir + "/batch.csv") as results:
+        results.write("job, image, strategy, points_amount, epochs, fitness, run_seconds, wall_seconds\n")
+
+        try:
+            while queue or running:
+                while queue and len(running) < active:
+                    config = queue.popleft()
+                    offset = min((job.time for job in running), default=0)
+                    running.append(Job(config, os.path.join(dir, config["name"]), pool, offset))
+
+                    # Setting up a strategy binds its classes
+                    current = None
+
+                job = min(running, key=lambda job: job.time)
+
+                if job is not current:
+                    job.activate(pool)
+                    current = job
+
+                slice_end = job.run.seconds + slice_seconds
+
+                while not job.run.done and job.run.seconds < slice_end:
+                    job.run.run_epoch()
+
+                if not job.run.done:
+                    continue
+
+                job.run.close()
+                running.remove(job)
+                finished += 1
+
+                config = job.config
+                wall_seconds = time.time() - job.start
+                results.write(
+                    f"{config['name']}, {config['image']}, {config['strategy']}, {config['points_amount']}, "
+                    f"{job.run.epoch}, {job.run.max}, {job.run.seconds}, {wall_seconds}\n"
+                )
+
+                images_per_hour = finished / (time.time() - start) * 3600
+
+                print(
+                    f"{config['name']} done after {job.run.epoch} epochs with fitness {round(job.run.max, 5)} | "
+                    f"{finished}/{len(configs)} images | {images_per_hour:.1f} images/hour"
+                )
+        finally:
+            for job in running:
+                job.run.close()
+
+    seconds = time.time() - start
+    save_metadata(dir, {**settings, "seconds": seconds, "images_per_hour": finished / seconds * 3600})
+
+    return finished / seconds * 3600
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    configs = load_jobs(arguments.source, load_config(arguments.config))
+    defaults = Experiment(load_config(arguments.config)).config
+
+    run_batch(
+        configs, create_dir_name("batch"), arguments.active, arguments.slice,
+        arguments.workers or defaults["workers"], defaults["shared_population"]
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+
+from base_classes import PROCESSING
+from timings import timed
+
+"""
+    - Evaluates a whole population at once instead of rendering and scoring every DNA on its own
+    - All DNA are rendered into one preallocated (P, H, W, 3) buffer, which is kept between epochs
+    - The reference is broadcast over the buffer and the population is scored in one kernel call
+"""
+
+class BatchEvaluator:
+    def __init__(self, reference, kernel, capacity=PROCESSING):
+        self.reference = reference
+        self.kernel = kernel
+        self.buffer = None
+        self.difference = None
+
+        self.reserve(capacity)
+
+    def reserve(self, size):
+        # Grows the buffers, smaller populations use the front of them
+        if self.buffer is not None and len(self.buffer) >= size:
+            return
+
+        self.buffer = np.empty((size,) + self.reference.shape, dtype=np.uint8)
+        self.difference = np.empty_like(self.buffer)
+
+    def render(self, population):
+        self.reserve(len(population))
+
+        for index, dna in enumerate(population):
+            dna.render(out=self.buffer[index])
+
+        return self.buffer[:len(population)]
+
+    def evaluate(self, population):
+        if len(population) == 0:
+            return []
+
+        with timed("render"):
+            images = self.render(population)
+
+        with timed("score"):
+            fitness = self.kernel.score_batch(self.reference, images, out=self.difference[:len(population)])
+
+        for dna, value in zip(population, fitness):
+            dna.fitness = value
+
+        return fitness.tolist()
+
+# One evaluator per DNA class and process, so the buffers are reused by every epoch
+evaluators = {}
+
+def get_evaluator(dna_class):
+    # Bound again to another reference, like a finer level of a multi resolution run
+    if dna_class not in evaluators or evaluators[dna_class].reference is not dna_class.reference:
+        evaluators[dna_class] = BatchEvaluator(dna_class.reference, dna_class.kernel)
+
+    return evaluators[dna_class]
+
+def evaluate_population(population):
+    if len(population) == 0:
+        return []
+
+    return get_evaluator(type(population[0])).evaluate(population)
@@ -0,0 +1,275 @@
+import argparse
+import platform
+import random
+import json
+import time
+import numpy as np
+
+from base_classes import BaseUtils, RENDER_BACKEND, RNG, WORKERS
+from evaluation_pool import EvaluationPool
+from experiment import Experiment
+from quantization import quantize
+from selection import SELECTIONS, select_parents
+from reference_cache import get_colors
+from strategies import STRATEGIES, SingleParentDNA, MultiParentDNA, SolvedDNA, MultiParentPopulationStrategy, bind
+
+"""
+    - Times the parts of the pipeline on their own: draw, get_fitness, every crossover, every parent selection,
+      reduce_color_amount, the palette quantizers and a full run_epoch of every strategy
+    - Every part runs for all combinations of points amounts, image sizes and (for run_epoch) worker counts
+    - The reference is a synthetic image, so the suite runs without any image file
+    - Results go to a JSON file, --baseline compares them to a stored one and flags everything that got slower
+    - python benchmark.py [--points 20 50 100] [--sizes 150x200 ...] [--workers 1 8] [--output FILE] [--baseline FILE]
+"""
+
+POINTS_AMOUNTS = [20, 50, 100]
+IMAGE_SIZES = ["150x200", "300x400", "600x800"]
+WORKER_COUNTS = sorted({1, WORKERS})
+# A benchmark runs at least MIN_RUNS times and at least MIN_TIME seconds
+MIN_TIME = 0.5
+MIN_RUNS = 3
+# Slower than the baseline by more than this share counts as a regression
+THRESHOLD = 0.1
+
+# Configs of the strategies run_epoch is timed for
+RUN_EPOCH_CONFIGS = {
+    "single_parent": {"strategy": "single_parent"},
+    "single_parent_full": {"strategy": "single_parent", "delta_evaluation": False},
+    "multi_parent": {"strategy": "multi_parent"},
+    "solved_color": {"strategy": "solved_color"}
+}
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=POINTS_AMOUNTS, help="points amounts of the grid")
+    parser.add_argument("--sizes", nargs="+", default=IMAGE_SIZES, help="image sizes as WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKER_COUNTS, help="worker counts of the pool")
+    parser.add_argument("--time", type=float, default=MIN_TIME, help="minimum seconds per benchmark")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file the results are written to")
+    parser.add_argument("--input", help="compare the results in this file instead of running the benchmarks")
+    parser.add_argument("--baseline", help="JSON file with results to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="share a benchmark may be slower")
+
+    return parser.parse_args()
+
+def parse_size(size):
+    width, height = size.split("x")
+
+    return int(width), int(height)
+
+def create_reference(size, seed=0):
+    # Gradients, a few discs and noise, so the image has many colors like a photo
+    width, height = size
+    generator = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width] / np.array([height, width])[:, None, None]
+
+    image = np.stack([x * 255, y * 255, (1 - x) * (1 - y) * 255], axis=2)
+
+    for center_x, center_y, radius, color in zip(
+        generator.random(8), generator.random(8), generator.random(8) * 0.3, generator.integers(0, 256, (8, 3))
+    ):
+        inside = (x - center_x) ** 2 + (y - center_y) ** 2 < radius ** 2
+        image[inside] = image[inside] * 0.3 + color * 0.7
+
+    image += generator.normal(0, 6, image.shape)
+
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def create_experiment(config, reference, colors, palette):
+    # Colors and palette are the same for every experiment on a reference, so they are only computed once
+    experiment = Experiment(config)
+    experiment.image = (reference, (reference.shape[1], reference.shape[0]), colors)
+    experiment.palette = palette
+
+    return experiment
+
+def measure(func, min_time=MIN_TIME):
+    # Seconds per call, after one call to warm up
+    func()
+
+    runs = 0
+    start = time.perf_counter()
+
+    while runs < MIN_RUNS or time.perf_counter() - start < min_time:
+        func()
+        runs += 1
+
+    return (time.perf_counter() - start) / runs
+
+def create_dna(dna_class):
+    dna = dna_class()
+    dna.grid.mutate(dna.offsets, np.arange(dna.grid.points_count))
+
+    return dna
+
+def get_result(name, seconds, points_amount=None, image_size=None, workers=None, **values):
+    return {
+        "name": name,
+        "points_amount": points_amount,
+        "image_size": image_size,
+        "workers": workers,
+        "seconds": seconds,
+        **values
+    }
+
+def benchmark_operators(experiment, min_time):
+    points_amount = experiment.config["points_amount"]
+    image_size = list(experiment.image_size)
+    results = []
+
+    for dna_class in (SingleParentDNA, MultiParentDNA, SolvedDNA):
+        bind(dna_class, experiment)
+
+    dna, mom, dad, solved = (create_dna(dna_class) for dna_class in (SingleParentDNA, MultiParentDNA, MultiParentDNA, SolvedDNA))
+
+    population = MultiParentPopulationStrategy(1, None, experiment.config["population_size"])
+    population.fitness = RNG.random(len(population.fitness)).tolist()
+
+    def add(name, func):
+        seconds = measure(func, min_time)
+        results.append(get_result(name, seconds, points_amount, image_size, per_second=1 / seconds))
+
+    add("draw", dna.draw)
+    add("get_fitness", dna.get_fitness)
+    add("crossover.single_parent", lambda: SingleParentDNA.crossover(dna, 1))
+    add("crossover.multi_parent", lambda: MultiParentDNA.crossover(mom, dad, 1))
+    add("crossover.solved_color", lambda: SolvedDNA.crossover(solved, 1))
+
+    for selection in SELECTIONS:
+        add("select_parents." + selection, lambda: select_parents(selection, population.fitness, population.size))
+
+    return results
+
+def benchmark_run_epoch(experiment, name, workers, min_time):
+    strategy = STRATEGIES[experiment.config["strategy"]](experiment)
+
+    # Single parents with delta evaluation never use the pool
+    if getattr(strategy, "evaluator", None) is not None:
+        workers = None
+
+    # Forked after the strategy bound its DNA class
+    with EvaluationPool(workers or 1, shared=experiment.config["shared_population"]) as pool:
+        strategy.pool = pool
+        seconds = measure(strategy.run_epoch, min_time)
+
+    return get_result(
+        "run_epoch." + name, seconds, experiment.config["points_amount"], list(experiment.image_size), workers,
+        generations_per_second=strategy.generations / seconds,
+        seconds_per_evaluation=seconds / (strategy.generations * experiment.config["population_size"])
+    )
+
+def benchmark_color_reduction(reference, colors, min_time):
+    seconds = measure(lambda: BaseUtils.reduce_color_amount(list(colors)), min_time)
+
+    return get_result("reduce_color_amount", seconds, image_size=[reference.shape[1], reference.shape[0]], colors=len(colors))
+
+def benchmark_quantization(reference, min_time):
+    results = []
+
+    for method in ("median_cut", "kmeans"):
+        seconds = measure(lambda: quantize(reference, method), min_time)
+        results.append(get_result("quantize." + method, seconds, image_size=[reference.shape[1], reference.shape[0]]))
+
+    return results
+
+def run_benchmarks(arguments):
+    # Every run times the same mutations
+    RNG.bit_generator.state = np.random.default_rng(0).bit_generator.state
+    random.seed(0)
+
+    results = []
+
+    def add(result):
+        print(format_result(result))
+        results.append(result)
+
+    for size in map(parse_size, arguments.sizes):
+        reference = create_reference(size)
+        colors = [tuple(color) for color in get_colors(reference).tolist()]
+
+        palette = BaseUtils.reduce_color_amount(list(colors))
+
+        add(benchmark_color_reduction(reference, colors, arguments.time))
+
+        for result in benchmark_quantization(reference, arguments.time):
+            add(result)
+
+        for points_amount in arguments.points:
+            experiment = create_experiment({"points_amount": points_amount}, reference, colors, palette)
+
+            for result in benchmark_operators(experiment, arguments.time):
+                add(result)
+
+            for name, config in RUN_EPOCH_CONFIGS.items():
+                for workers in arguments.workers:
+                    experiment = create_experiment({**config, "points_amount": points_amount}, reference, colors, palette)
+                    add(benchmark_run_epoch(experiment, name, workers, arguments.time))
+
+                    # Workers weren't used, the other counts would time the same
+                    if results[-1]["workers"] is None:
+                        break
+
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "render_backend": RENDER_BACKEND
+        },
+        "results": results
+    }
+
+def get_key(result):
+    return result["name"], result["points_amount"], str(result["image_size"]), result["workers"]
+
+def format_key(result):
+    name, points_amount, image_size, workers = get_key(result)
+
+    return f"{name} points={points_amount} size={image_size} workers={workers}"
+
+def format_result(result):
+    return f"{format_key(result).ljust(70)} {result['seconds'] * 1000:10.3f} ms"
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # Returns the results slower than their baseline by more than threshold
+    baseline = {get_key(result): result for result in baseline["results"]}
+    regressions = []
+
+    for result in results["results"]:
+        reference = baseline.get(get_key(result))
+
+        if reference is None:
+            continue
+
+        change = result["seconds"] / reference["seconds"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+
+        print(f"{format_key(result).ljust(70)} {reference['seconds'] * 1000:10.3f} ms -> {result['seconds'] * 1000:10.3f} ms {change * 100:+7.1f}% {flag}")
+
+        if change > threshold:
+            regressions.append(result)
+
+    return regressions
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.input:
+        with open(arguments.input) as file:
+            results = json.load(file)
+    else:
+        results = run_benchmarks(arguments)
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file), arguments.threshold)
+
+        print(f"{len(regressions)} regressions")
+
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,99 @@
+import numpy as np
+import argparse
+import random
+import json
+import os
+
+from base_classes import RNG
+from frames import FRAMES_FILE, truncate_frames
+
+"""
+    - Checkpoints of a run are written into its directory as checkpoint.npz
+    - Population, best DNA, epoch, mutation rate and the state of both random generators are stored
+    - Written into a temporary file first and then renamed, so a crash never leaves a broken checkpoint
+    - python <experiment>.py --resume <dir> continues the run of a directory after its last checkpoint
+"""
+
+CHECKPOINT_FREQUENCY = 250
+
+CHECKPOINT_FILE = "checkpoint.npz"
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", metavar="DIR", help="continue the run in DIR from its last checkpoint")
+
+    return parser.parse_args()
+
+def save_checkpoint(dir, epoch, best_dna, population=(), mutation_rate=0, **values):
+    # values: further numbers of the experiment, like the all time best fitness
+    path = os.path.join(dir, CHECKPOINT_FILE)
+    data = {
+        "epoch": epoch,
+        "mutation_rate": mutation_rate,
+        "best_offsets": best_dna.offsets,
+        "best_colors": best_dna.colors,
+        "best_fitness": best_dna.fitness,
+        "rng_state": json.dumps(RNG.bit_generator.state),
+        "random_state": json.dumps(random.getstate()),
+        "values": json.dumps(values)
+    }
+
+    if len(population) > 0:
+        data["offsets"] = np.stack([dna.offsets for dna in population])
+        data["colors"] = np.stack([dna.colors for dna in population])
+        data["fitness"] = np.array([dna.fitness for dna in population], dtype=np.float64)
+
+    with open(path + ".tmp", "wb") as file:
+        np.savez(file, **data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(path + ".tmp", path)
+
+def load_dna(dna_class, offsets, colors, fitness):
+    dna = dna_class(offsets.copy(), colors.copy())
+    dna.fitness = float(fitness)
+
+    return dna
+
+def load_checkpoint(dir, dna_class):
+    # Restores the random generators, the returned DNA are instances of dna_class
+    with np.load(os.path.join(dir, CHECKPOINT_FILE)) as data:
+        RNG.bit_generator.state = json.loads(str(data["rng_state"]))
+
+        version, internal_state, gauss_next = json.loads(str(data["random_state"]))
+        random.setstate((version, tuple(internal_state), gauss_next))
+
+        population = []
+
+        if "offsets" in data:
+            population = [
+                load_dna(dna_class, offsets, colors, fitness)
+                for offsets, colors, fitness in zip(data["offsets"], data["colors"], data["fitness"])
+            ]
+
+        return {
+            "epoch": int(data["epoch"]),
+            # int or float like it was saved, a constant factor of 1 is logged as 1 and not 1.0 after resuming
+            "mutation_rate": data["mutation_rate"].item(),
+            "best_dna": load_dna(dna_class, data["best_offsets"], data["best_colors"], data["best_fitness"]),
+            "population": population,
+            **json.loads(str(data["values"]))
+        }
+
+def truncate_log(dir, epoch):
+    # Epochs after the checkpoint are run again, their lines are removed from the log and their frames from frames.bin
+    truncate_frames(os.path.join(dir, FRAMES_FILE), epoch)
+
+    path = os.path.join(dir, "log.csv")
+
+    if not os.path.exists(path):
+        return
+
+    with open(path) as file:
+        lines = file.readlines()
+
+    kept = [line for line in lines if not line.split(",")[0].isdigit() or int(line.split(",")[0]) <= epoch]
+
+    with open(path, "w") as file:
+        file.writelines(kept)
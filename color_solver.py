@@ -0,0 +1,93 @@
+import numpy as np
+
+from base_classes import PROCESSING, RENDER_BACKEND
+from genome import DNA, Population
+from label_map import LabelMapCache
+
+import rasterizer
+import operators
+
+"""
+    - For fixed points the best flat color of a triangle only depends on the reference pixels it covers
+    - The triangle covering every pixel is rasterized into a label map once per geometry and cached until a point moves
+    - Colors of all triangles are solved at once with np.bincount over the label map, so the GA only searches points
+"""
+
+COLOR_SOLVE_MODES = ("optimal", "mean")
+
+class ColorSolver:
+    def __init__(self, reference, grid, kernel, mode="optimal", cache_size=PROCESSING * 2):
+        if mode not in COLOR_SOLVE_MODES:
+            raise ValueError(f"Unknown color solve mode {mode}")
+
+        self.reference = reference
+        self.grid = grid
+        self.kernel = kernel
+        self.mode = mode
+        self.labels = LabelMapCache(grid, cache_size)
+
+        # gain[r, v]: fitness of a channel drawn as v where the reference is r, float32 halves the cost of the product
+        values = np.arange(256)
+        self.gain = kernel.table[np.abs(values[:, None] - values[None, :])].astype(np.float32)
+
+    def get_labels(self, offsets):
+        return self.labels.get(offsets)
+
+    def solve(self, offsets, colors):
+        labels = self.get_labels(offsets)
+        covered = labels >= 0
+
+        triangles = labels[covered]
+        pixels = self.reference[covered]
+
+        amount = self.grid.triangle_count
+        counts = np.bincount(triangles, minlength=amount)
+
+        # Triangles covering no pixel are hidden, they keep their color
+        solved = colors.copy()
+        visible = counts > 0
+
+        for channel in range(3):
+            if self.mode == "mean":
+                sums = np.bincount(triangles, weights=pixels[:, channel], minlength=amount)
+                solved[visible, channel] = np.rint(sums[visible] / counts[visible])
+            else:
+                # Histogram of the reference values under every triangle, scored against every possible value
+                histogram = np.bincount(triangles * 256 + pixels[:, channel], minlength=amount * 256)
+                histogram = histogram.reshape((amount, 256))[visible].astype(np.float32)
+                solved[visible, channel] = np.argmax(histogram @ self.gain, axis=1)
+
+        return solved
+
+class SolvedColorDNA(DNA):
+    solver = None
+
+    def solve_colors(self):
+        # Mutations create new DNA, so colors are solved once per geometry
+        if not getattr(self, "solved", False):
+            self.colors = self.solver.solve(self.offsets, self.colors)
+            self.solved = True
+
+    def render(self, backend=None, out=None):
+        self.solve_colors()
+
+        if (backend or RENDER_BACKEND) == "numpy":
+            return rasterizer.paint(self.solver.get_labels(self.offsets), self.colors, out)
+
+        return super().render(backend, out)
+
+    @staticmethod
+    def crossover(mom, mutation_propabilities):
+        return operators.mutate(mom, mutation_propabilities, 0)
+
+class SolvedColorPopulation(Population):
+    dna_class = SolvedColorDNA
+    elitism = True
+
+    def run_epoch(self):
+        best_dna, max, min = super().run_epoch()
+
+        # Workers only return the fitness, solving again gives the same colors
+        best_dna.solve_colors()
+
+        return best_dna, max, min
@@ -0,0 +1,182 @@
+import aggdraw
+import numpy as np
+
+from base_classes import RENDER_BACKEND
+from label_map import LabelMapCache, triangle_errors
+
+import rasterizer
+
+"""
+    - Evaluates the children of a single parent by redrawing only the triangles touched by their mutations
+    - Keeps the rendered image and the per pixel fitness of the parent
+    - Fitness of a child is the fitness of the parent plus the change inside the redrawn tiles
+    - Tiles touched by a mutated triangle are marked on a coarse grid and drawn together in one rasterizer call,
+      only the triangles reaching a marked tile are drawn
+    - The per pixel fitness of the parent also gives its error per triangle
+"""
+
+# Side length in pixels of the tiles redrawn for a child
+TILE_SIZE = 8
+
+class DeltaEvaluator:
+    def __init__(self, reference, grid, kernel):
+        self.grid = grid
+        self.image_size = grid.image_size
+        self.reference = reference
+        self.kernel = kernel
+        self.triangles = grid.triangles
+
+        # Up to six triangles share a point of the grid, -1 fills the rows of points with less
+        self.point_triangles = np.full((grid.points_count, 6), -1, dtype=np.int64)
+        counts = np.zeros(grid.points_count, dtype=np.int64)
+
+        for triangle_index, triangle in enumerate(self.triangles):
+            for point_index in triangle:
+                self.point_triangles[point_index, counts[point_index]] = triangle_index
+                counts[point_index] += 1
+
+        width, height = self.image_size
+        self.tiles_shape = (-(-height // TILE_SIZE), -(-width // TILE_SIZE))
+
+        self.labels = LabelMapCache(grid, 2)
+
+        self.parent = None
+        self.parent_tiles = None
+        self.canvas = None
+        self.scores = None
+        self.fitness = 0
+
+    def score(self, ref_data, data):
+        return np.sum(self.kernel.pixel_scores(ref_data, data), axis=-1)
+
+    def get_tile_ranges(self, coords, triangles=slice(None)):
+        # First and end tile (x0, y0, x1, y1) the triangles can change, one more pixel around them for anti aliasing
+        a, b, c = (coords[self.triangles[triangles, corner]] for corner in range(3))
+        first = np.floor(np.minimum(np.minimum(a, b), c)) - 1
+        end = np.ceil(np.maximum(np.maximum(a, b), c)) + 2
+
+        first = np.maximum(first // TILE_SIZE, 0).astype(np.int64)
+        end = np.minimum(-(-end // TILE_SIZE), (self.tiles_shape[1], self.tiles_shape[0])).astype(np.int64)
+
+        return np.hstack([first, np.maximum(end, first)])
+
+    def get_dirty_tiles(self, ranges):
+        # Every range adds one to its tiles through the corners of a 2D difference array, overlaps are counted once
+        count = np.zeros((self.tiles_shape[0] + 1, self.tiles_shape[1] + 1), dtype=np.int32)
+        x0, y0, x1, y1 = ranges.T
+
+        np.add.at(count, (y0, x0), 1)
+        np.add.at(count, (y0, x1), -1)
+        np.add.at(count, (y1, x0), -1)
+        np.add.at(count, (y1, x1), 1)
+
+        return np.cumsum(np.cumsum(count, axis=0), axis=1)[:-1, :-1] > 0
+
+    def get_visible(self, tiles, ranges):
+        # Triangles reaching a dirty tile, from the summed area table of the dirty tiles
+        table = np.zeros((tiles.shape[0] + 1, tiles.shape[1] + 1), dtype=np.int32)
+        table[1:, 1:] = np.cumsum(np.cumsum(tiles, axis=0), axis=1)
+        x0, y0, x1, y1 = ranges.T
+
+        return np.nonzero(table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0] > 0)[0]
+
+    def get_pixels(self, tiles):
+        # Flat indices of the pixels of the dirty tiles, tiles along the right and bottom border are cut off
+        width, height = self.image_size
+        tile_y, tile_x = np.nonzero(tiles)
+        steps = np.arange(TILE_SIZE)
+
+        y = np.broadcast_to(tile_y[:, None, None] * TILE_SIZE + steps[:, None], (len(tile_y), TILE_SIZE, TILE_SIZE))
+        x = np.broadcast_to(tile_x[:, None, None] * TILE_SIZE + steps, (len(tile_x), TILE_SIZE, TILE_SIZE))
+        inside = (y < height) & (x < width)
+
+        return y[inside] * width + x[inside]
+
+    def draw_tiles(self, dna, coords, tiles, visible, pixels):
+        # All dirty tiles are drawn at once on a canvas of their bounding box, only their pixels are returned
+        width, height = self.image_size
+        rows, columns = np.nonzero(tiles.any(axis=1))[0], np.nonzero(tiles.any(axis=0))[0]
+
+        x0, y0 = columns[0] * TILE_SIZE, rows[0] * TILE_SIZE
+        x1, y1 = min((columns[-1] + 1) * TILE_SIZE, width), min((rows[-1] + 1) * TILE_SIZE, height)
+
+        if RENDER_BACKEND != "numpy":
+            # Anti aliasing differs along the border of a canvas, so a wider one is drawn
+            x0, y0, x1, y1 = max(x0 - 2, 0), max(y0 - 2, 0), min(x1 + 2, width), min(y1 + 2, height)
+
+        y, x = np.divmod(pixels, width)
+        local = (y - y0) * (x1 - x0) + (x - x0)
+
+        if RENDER_BACKEND == "numpy":
+            labels = rasterizer.rasterize(coords[self.triangles[visible]], (x1 - x0, y1 - y0), (x0, y0))
+
+            return rasterizer.paint(labels.ravel()[local], dna.colors[visible])
+
+        # Drawn into the buffer of aggdraw, a PIL image would be copied in and out of it
+        draw = aggdraw.Draw("RGB", (x1 - x0, y1 - y0), rasterizer.BACKGROUND)
+        vertices = (coords[self.triangles[visible]] - (x0, y0)).reshape((-1, 6)).tolist()
+
+        # Same order as DNA.draw, so overlapping edges end up close to a full redraw
+        for triangle, color in zip(vertices, dna.colors[visible].tolist()):
+            draw.polygon(triangle, aggdraw.Brush(tuple(color)))
+
+        draw.flush()
+
+        return np.frombuffer(draw.tobytes(), dtype=np.uint8).reshape((-1, 3))[local]
+
+    def evaluate(self, dna):
+        if dna is self.parent:
+            dna.fitness = self.fitness
+            return dna.fitness
+
+        if self.parent is None or getattr(dna, "parent_serial", None) != self.parent.serial:
+            return dna.get_fitness()
+
+        triangles = np.concatenate([dna.mutated_colors, self.point_triangles[dna.mutated_points].ravel()])
+        triangles = np.unique(triangles[triangles >= 0]).astype(np.int64)
+
+        coords = dna.coords()
+
+        # Tiles of the mutated triangles where they are in the child and where they were in the parent
+        tiles = self.get_dirty_tiles(np.vstack([self.get_tile_ranges(coords, triangles), self.parent_tiles[triangles]]))
+        pixels = self.get_pixels(tiles)
+
+        if len(pixels) == 0:
+            patch = np.zeros((0, 3), dtype=np.uint8)
+        else:
+            # Triangles that weren't mutated are where they were in the parent
+            visible = np.union1d(self.get_visible(tiles, self.parent_tiles), triangles)
+            patch = self.draw_tiles(dna, coords, tiles, visible, pixels)
+
+        patch_scores = self.score(self.reference.reshape((-1, 3))[pixels], patch)
+
+        dna.delta = (pixels, patch, patch_scores)
+        dna.fitness = self.fitness + np.sum(patch_scores) - np.sum(self.scores.ravel()[pixels])
+
+        return dna.fitness
+
+    def get_triangle_errors(self):
+        return triangle_errors(self.kernel, self.scores, self.labels.get(self.parent.offsets), self.grid.triangle_count)
+
+    def set_parent(self, dna):
+        if dna is self.parent:
+            return
+
+        delta = getattr(dna, "delta", None)
+
+        if self.parent is not None and delta is not None and dna.parent_serial == self.parent.serial:
+            pixels, patch, patch_scores = delta
+
+            self.canvas.reshape((-1, 3))[pixels] = patch
+            self.scores.reshape(-1)[pixels] = patch_scores
+        else:
+            self.canvas = np.array(dna.render())
+            self.scores = self.score(self.reference, self.canvas)
+
+        dna.delta = None
+
+        self.parent = dna
+        self.parent_tiles = self.get_tile_ranges(dna.coords())
+        # Summed up again instead of adding deltas, so rounding errors don't pile up over the run
+        self.fitness = np.sum(self.scores)
+        dna.fitness = self.fitness
@@ -0,0 +1,175 @@
+from multiprocessing import resource_tracker
+
+import numpy as np
+import signal
+import pickle
+import time
+
+from base_classes import WORKERS, get_fork_context
+from batch_evaluation import evaluate_population
+from shared_population import SharedPopulation, attach
+from timings import timed, get_worker_result, add_worker_results
+
+"""
+    - Long living pool of worker processes evaluating the fitness of DNA
+    - Created once per run and reused by every epoch instead of starting a Process per DNA
+    - Workers are always forked after the experiment is set up, so they share its reference image and bound classes
+    - The population size is independent of the amount of workers, which defaults to one per core
+    - The population is split into chunks evaluated as a batch, one per worker until the measured cost of an evaluation
+      allows smaller chunks of at least TASK_SECONDS, which idle workers pick up for load balancing
+    - With shared set, chunks are slots of a SharedPopulation and only their range is sent to the workers
+    - Tasks and results are pickled once into bytes, their size of the last call is kept in ipc_bytes
+    - A binding set on the pool goes with every task, workers bind the DNA class with it whenever it differs from the
+      last one, so experiments set up after the fork (the jobs of a batch) can share the pool
+"""
+
+# Tasks shorter than this are dominated by the IPC around them
+TASK_SECONDS = 0.02
+
+def init_worker():
+    # Ctrl+C is handled by the master, which then terminates the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+# Key of the binding every DNA class of this worker was bound with last
+bound = {}
+
+def apply_binding(binding, dna_class):
+    if binding is not None and bound.get(dna_class) != binding.key:
+        binding.apply(dna_class)
+        bound[dna_class] = binding.key
+
+def evaluate_chunk(chunk, binding):
+    with timed("task"):
+        apply_binding(binding, type(chunk[0]))
+        fitness = evaluate_population(chunk)
+
+    return fitness, get_worker_result()
+
+def evaluate_slots(name, dna_class, capacity, start, stop, binding):
+    with timed("task"):
+        apply_binding(binding, dna_class)
+        buffer = attach(name, dna_class, capacity)
+        buffer.fitness[start:stop] = evaluate_population(buffer.read(start, stop))
+
+    return get_worker_result()
+
+def run_task(task):
+    # Tasks and results cross the pipe pickled once as bytes, so the master knows their size without pickling again
+    function, arguments = pickle.loads(task)
+
+    return pickle.dumps(function(*arguments))
+
+class EvaluationPool:
+    def __init__(self, processes=None, shared=True):
+        processes = processes or WORKERS
+
+        self.processes = processes
+        self.shared = shared
+        self.buffers = {}
+        self.ipc_bytes = 0
+        # Seconds per evaluation, smoothed over the calls so far
+        self.evaluation_cost = None
+        # Object with a key and apply(dna_class), see apply_binding
+        self.binding = None
+        # Started before the fork, so workers register shared buffers with the tracker of the master
+        resource_tracker.ensure_running()
+        self.pool = get_fork_context().Pool(processes, initializer=init_worker)
+
+    def get_ranges(self, amount):
+        size = -(-amount // self.processes)
+
+        if self.processes > 1 and self.evaluation_cost:
+            size = min(size, max(int(TASK_SECONDS / self.evaluation_cost), 1))
+
+        # Chunks differ by at most one DNA
+        bounds = np.linspace(0, amount, -(-amount // size) + 1).round().astype(int).tolist()
+
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def measure(self, seconds, amount, tasks):
+        # Workers running in parallel, as long as there were enough tasks for all of them
+        cost = seconds * min(self.processes, tasks) / amount
+        self.evaluation_cost = cost if self.evaluation_cost is None else (self.evaluation_cost + cost) / 2
+
+    def get_buffer(self, dna_class, amount):
+        # One buffer per DNA class and grid size, replaced by a larger one when a population doesn't fit
+        key = (dna_class, dna_class.grid.points_count)
+        buffer = self.buffers.get(key)
+
+        if buffer is None or buffer.capacity < amount:
+            if buffer is not None:
+                buffer.close()
+
+            buffer = self.buffers[key] = SharedPopulation(dna_class, amount)
+
+        return buffer
+
+    def map(self, tasks):
+        # tasks: (function, arguments) run by the workers, their results in the order of the tasks
+        with timed("map"):
+            tasks = [pickle.dumps(task) for task in tasks]
+            results = self.pool.map(run_task, tasks, chunksize=1)
+
+        self.ipc_bytes = sum(len(task) for task in tasks) + sum(len(result) for result in results)
+
+        return [pickle.loads(result) for result in results]
+
+    def evaluate(self, population):
+        # Results are returned in the order of the population
+        if len(population) == 0:
+            return []
+
+        ranges = self.get_ranges(len(population))
+
+        if self.shared:
+            with timed("write"):
+                buffer = self.get_buffer(type(population[0]), len(population))
+                buffer.write(population)
+
+            tasks = [
+                (evaluate_slots, (buffer.name, buffer.dna_class, buffer.capacity, start, stop, self.binding))
+                for start, stop in ranges
+            ]
+
+            start = time.perf_counter()
+            results = self.map(tasks)
+
+            fitness = buffer.fitness[:len(population)].tolist()
+            add_worker_results(results)
+        else:
+            tasks = [(evaluate_chunk, (population[start:stop], self.binding)) for start, stop in ranges]
+
+            start = time.perf_counter()
+            results = self.map(tasks)
+
+            fitness = [value for chunk, _ in results for value in chunk]
+            add_worker_results([result for _, result in results])
+
+        self.measure(time.perf_counter() - start, len(population), len(tasks))
+
+        return fitness
+
+    def close_buffers(self):
+        for buffer in self.buffers.values():
+            buffer.close()
+
+        self.buffers = {}
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.close_buffers()
+
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
+        self.close_buffers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
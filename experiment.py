@@ -0,0 +1,156 @@
+from functools import cached_property
+
+import time
+
+from base_classes import BaseUtils, PaletteUtils, PROCESSING, ISOLATION_CYCLES, Grid
+from fitness_kernels import KERNELS
+from quantization import PALETTE_METHODS, PALETTE_SIZE, get_palette
+from selection import SELECTIONS, TOURNAMENT_SIZE
+from mutation_control import MUTATION_CONTROLS
+from frames import SNAPSHOT_FORMATS
+
+"""
+    - Everything a run needs, built from its config the first time a strategy asks for it
+    - The image is decoded, the palette reduced and the grid built at most once per experiment
+    - The time every setup step took is kept in timings, so startup cost can be compared between configs
+"""
+
+DEFAULT_CONFIG = {
+    # "single_parent", "multi_parent" or "solved_color", see strategies.py
+    "strategy": "single_parent",
+    "name": None,
+    "image": "../mona_lisa.jpg",
+    "points_amount": 50,
+    "population_size": PROCESSING,
+    # Worker processes of the evaluation pool, None for one per core
+    "workers": None,
+    "point_mutation": 0.005,
+    "color_mutation": 0.0003,
+    "max_mutations": None,
+    # "roulette", "rank" or "tournament", parent selection of the multi_parent strategy, see selection.py
+    "selection": "roulette",
+    "tournament_size": TOURNAMENT_SIZE,
+    # None keeps both mutation rates, "random" draws a factor for both every epoch, "success_rule" adapts them
+    # separately to the share of children beating their parent (single parent strategies), see mutation_control.py
+    "dynamic_mutation": None,
+    "kernel": "steep_penalty",
+    # "random" in range 0x33 - 0xCC, "image" for all colors of the image or "reduced" for the reduced palette
+    "colors": "reduced",
+    # "median_cut", "kmeans" or "gradient", how the reduced palette is computed, see quantization.py
+    "palette_method": "median_cut",
+    "palette_size": PALETTE_SIZE,
+    # "optimal" or "mean", only for the solved_color strategy
+    "color_solve": "optimal",
+    "delta_evaluation": True,
+    # Stride of the pixel subset children of single parents are screened on, 0 evaluates all of them fully.
+    # Only used without delta evaluation, see screening.py
+    "screening": 0,
+    # Children within this share of the estimated elite fitness are evaluated fully
+    "screening_margin": 0.0001,
+    # Share of the rejected children evaluated fully anyway, for the false rejection rate
+    "screening_audit": 0.05,
+    # Genomes go to the workers through shared memory instead of being pickled
+    "shared_population": True,
+    # Amount of island processes evolving their own population, 0 evolves one population with the pool
+    "islands": 0,
+    "isolation_cycles": ISOLATION_CYCLES,
+    # "ring", "fully_connected" or "none", see islands.py
+    "topology": "ring",
+    # Levels of the image pyramid, the run starts on the coarsest one, see multi_resolution.py
+    "levels": 1,
+    # Coarser levels have a grid with half the intervals, points_amount - 1 has to be divisible by 2 ** (levels - 1)
+    "subdivide": False,
+    # A level is left when the best fitness improved less than plateau_threshold (relative) over plateau_epochs
+    "plateau_epochs": 100,
+    "plateau_threshold": 0.001,
+    "error_targeting": True,
+    "save_frequency": 100,
+    # "png" writes an image every save_frequency epochs, "frames" appends the best DNA to frames.bin, see frames.py
+    "snapshots": "png",
+    # Wall time per phase, epoch and worker in timings.jsonl, see timings.py
+    "timings": False,
+    # Epochs between cProfile dumps (profile_<epoch>.prof in the run directory), None never profiles
+    "profile_frequency": None,
+    # Stop after this many epochs, None runs until interrupted
+    "epochs": None,
+    # Stop once the best fitness reached this, None never stops for it
+    "target_fitness": None,
+    # Stop after this many seconds of evolution (not counting startup), None never stops for it
+    "max_seconds": None
+}
+
+COLOR_MODES = ("random", "image", "reduced")
+
+class Experiment:
+    def __init__(self, config):
+        unknown = set(config) - set(DEFAULT_CONFIG)
+
+        if unknown:
+            raise ValueError(f"Unknown config keys {', '.join(sorted(unknown))}")
+
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.timings = {}
+
+        if self.config["colors"] not in COLOR_MODES:
+            raise ValueError(f"Unknown colors {self.config['colors']}")
+
+        if self.config["selection"] not in SELECTIONS:
+            raise ValueError(f"Unknown selection {self.config['selection']}")
+
+        if self.config["dynamic_mutation"] and self.config["dynamic_mutation"] not in MUTATION_CONTROLS:
+            raise ValueError(f"Unknown dynamic mutation {self.config['dynamic_mutation']}")
+
+        if self.config["snapshots"] not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown snapshots {self.config['snapshots']}")
+
+        if self.config["palette_method"] not in PALETTE_METHODS:
+            raise ValueError(f"Unknown palette method {self.config['palette_method']}")
+
+        if self.config["kernel"] not in KERNELS:
+            raise ValueError(f"Unknown kernel {self.config['kernel']}")
+
+        if self.config["name"] is None:
+            self.config["name"] = self.config["strategy"]
+
+    def timed(self, name, func):
+        start = time.time()
+        value = func()
+        self.timings[name] = time.time() - start
+
+        return value
+
+    @cached_property
+    def image(self):
+        return self.timed("image", lambda: BaseUtils.get_image_values(self.config["image"]))
+
+    @property
+    def reference(self):
+        return self.image[0]
+
+    @property
+    def image_size(self):
+        return self.image[1]
+
+    @cached_property
+    def palette(self):
+        if self.config["colors"] == "reduced":
+            return self.timed("palette", lambda: get_palette(
+                self.config["image"], self.reference, self.config["palette_method"], self.config["palette_size"]
+            ))
+
+        return self.image[2]
+
+    @cached_property
+    def utils(self):
+        if self.config["colors"] == "random":
+            return BaseUtils([], self.config["points_amount"])
+
+        return PaletteUtils(self.palette, self.config["points_amount"])
+
+    @cached_property
+    def grid(self):
+        return self.timed("grid", lambda: Grid(self.config["points_amount"], self.image_size))
+
+    @property
+    def kernel(self):
+        return KERNELS[self.config["kernel"]]
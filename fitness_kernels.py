@@ -0,0 +1,55 @@
+import numpy as np
+
+"""
+    - Fitness functions as lookup tables over the absolute difference of a channel, which is only 0 - 255
+    - The table is built once per kernel, reference and image stay uint8
+    - Scoring an (H, W, 3) image is a histogram of its differences weighted by the table
+"""
+
+class FitnessKernel:
+    def __init__(self, func, clip_sum=False):
+        # func maps the absolute difference of a channel to its fitness
+        self.table = func(np.arange(256, dtype=np.float64)) * 0.000001
+        # Negative sums are clipped to 0 instead of the values of single pixels
+        self.clip_sum = clip_sum
+
+    @staticmethod
+    def difference(ref_data, data):
+        # Absolute difference without leaving uint8
+        return np.maximum(ref_data, data) - np.minimum(ref_data, data)
+
+    def pixel_scores(self, ref_data, data):
+        return self.table[FitnessKernel.difference(ref_data, data)]
+
+    def score(self, ref_data, data):
+        # Counting the differences first is cheaper than summing up the looked up value of every pixel
+        counts = np.bincount(FitnessKernel.difference(ref_data, data).ravel(), minlength=256)
+        fitness = counts @ self.table
+
+        if self.clip_sum:
+            return max(fitness, 0)
+
+        return fitness
+
+    def score_batch(self, ref_data, data, out=None):
+        # data: (P, H, W, 3) images of a population, ref_data is broadcast over them
+        difference = np.maximum(ref_data, data, out=out)
+        difference -= np.minimum(ref_data, data)
+
+        counts = np.empty((len(data), 256), dtype=np.int64)
+
+        for index, image in enumerate(difference):
+            counts[index] = np.bincount(image.ravel(), minlength=256)
+
+        fitness = counts @ self.table
+
+        if self.clip_sum:
+            return np.maximum(fitness, 0)
+
+        return fitness
+
+KERNELS = {
+    "default": FitnessKernel(lambda d: np.maximum(50 * np.power(1.02, -d), 0)),
+    "steep": FitnessKernel(lambda d: np.maximum(8000 * np.power(1.06, -d) - 1, 0)),
+    "steep_penalty": FitnessKernel(lambda d: 8000 * np.power(1.06, -d) - 1, clip_sum=True)
+}
@@ -0,0 +1,261 @@
+from contextlib import nullcontext
+
+import numpy as np
+import argparse
+import struct
+import json
+import sys
+import os
+
+from base_classes import Grid
+from genome import draw_triangles
+
+"""
+    - Snapshots of a run as one file of genomes instead of a PNG per snapshot, nothing is drawn while the run goes on
+    - frames.bin is a list of segments, each a header with its grid and frame count followed by fixed size frames
+      (epoch, fitness, offsets, colors), a new segment starts when the grid changes like on a multi resolution run
+    - The writer only keeps the position of the count it updates after every frame, so memory doesn't grow with the run
+    - Frames are read through memory maps, only epoch and fitness of every frame are read up front and drawing a frame
+      reads nothing but that frame
+    - A frame cut off by a crash is dropped when the file is opened for writing again
+    - python frames.py DIR [--epochs 0 5000 -1] [--every N] [--output DIR] [--video FILE] [--raw] [--width W]
+"""
+
+FRAMES_FILE = "frames.bin"
+MAGIC = b"DNAF"
+# Magic, length of the JSON part and frame count
+HEADER = struct.Struct("<4sIQ")
+COUNT_OFFSET = 8
+
+# "png" writes an image per snapshot, "frames" appends the genome to frames.bin
+SNAPSHOT_FORMATS = ("png", "frames")
+
+def get_frame_dtype(points_amount):
+    triangle_count = (points_amount - 1) * 2 * (points_amount - 1)
+
+    return np.dtype([
+        ("epoch", "<i8"),
+        ("fitness", "<f8"),
+        ("offsets", "<f4", (points_amount * points_amount, 2)),
+        ("colors", "u1", (triangle_count, 3))
+    ])
+
+def get_grid_key(grid):
+    return grid.points_amount, tuple(grid.image_size)
+
+def read_segments(file):
+    # (position, frames position, info, count) of every complete segment, and where the complete part of the file ends
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    segments = []
+    position = 0
+
+    while position + HEADER.size <= size:
+        file.seek(position)
+        magic, length, count = HEADER.unpack(file.read(HEADER.size))
+
+        if magic != MAGIC or position + HEADER.size + length > size:
+            break
+
+        info = json.loads(file.read(length))
+        start = position + HEADER.size + length
+        itemsize = get_frame_dtype(info["points_amount"]).itemsize
+        # The count is updated after the frame is written, frames behind it are cut off
+        count = min(count, (size - start) // itemsize)
+
+        segments.append((position, start, info, count))
+        position = start + count * itemsize
+
+    return segments, position
+
+class FrameWriter:
+    def __init__(self, path):
+        self.file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        self.grid_key = None
+        self.count = 0
+        self.count_position = None
+        self.last_epoch = None
+
+        _, end = read_segments(self.file)
+        self.file.truncate(end)
+        self.file.seek(end)
+
+    def start_segment(self, grid):
+        info = json.dumps({"points_amount": grid.points_amount, "image_size": list(grid.image_size)}).encode()
+
+        self.count_position = self.file.tell() + COUNT_OFFSET
+        self.file.write(HEADER.pack(MAGIC, len(info), 0) + info)
+        self.grid_key = get_grid_key(grid)
+        self.count = 0
+
+    def append(self, epoch, dna):
+        # A frame already stored for this epoch, like a snapshot for a new best in an epoch due anyway, is skipped
+        if epoch == self.last_epoch:
+            return
+
+        if get_grid_key(dna.grid) != self.grid_key:
+            self.start_segment(dna.grid)
+
+        frame = np.zeros((), dtype=get_frame_dtype(dna.grid.points_amount))
+        frame["epoch"] = epoch
+        frame["fitness"] = dna.fitness
+        frame["offsets"] = dna.offsets
+        frame["colors"] = dna.colors
+
+        self.file.write(frame.tobytes())
+        self.count += 1
+        self.last_epoch = epoch
+
+        self.file.seek(self.count_position)
+        self.file.write(struct.pack("<Q", self.count))
+        self.file.seek(0, os.SEEK_END)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_frames(dir, stream):
+    # FrameWriter of the run in dir, or a context giving None while the run writes PNG snapshots
+    return FrameWriter(os.path.join(dir, FRAMES_FILE)) if stream else nullcontext()
+
+def truncate_frames(path, epoch):
+    # Frames after epoch are removed, used when a run resumes from its checkpoint
+    if not os.path.exists(path):
+        return
+
+    with open(path, "r+b") as file:
+        segments, end = read_segments(file)
+
+        for position, start, info, count in segments:
+            if count == 0:
+                continue
+
+            dtype = get_frame_dtype(info["points_amount"])
+            epochs = np.memmap(file, dtype=dtype, mode="r", offset=start, shape=(count,))["epoch"]
+            kept = int(np.searchsorted(epochs, epoch, side="right"))
+            del epochs
+
+            if kept < count:
+                # A segment without frames left goes with its header
+                end = start + kept * dtype.itemsize if kept > 0 else position
+
+                file.seek(position + COUNT_OFFSET)
+                file.write(struct.pack("<Q", kept))
+                break
+
+        file.truncate(end)
+
+class FrameReader:
+    def __init__(self, path):
+        self.path = path
+        self.segments = []
+
+        with open(path, "rb") as file:
+            segments, _ = read_segments(file)
+
+        for _, start, info, count in segments:
+            if count == 0:
+                continue
+
+            frames = np.memmap(path, dtype=get_frame_dtype(info["points_amount"]), mode="r", offset=start, shape=(count,))
+            self.segments.append((Grid(info["points_amount"], tuple(info["image_size"])), frames))
+
+        self.starts = np.cumsum([0] + [len(frames) for _, frames in self.segments])
+        self.epochs = np.concatenate([frames["epoch"] for _, frames in self.segments] or [np.zeros(0, dtype=np.int64)])
+        self.fitness = np.concatenate([frames["fitness"] for _, frames in self.segments] or [np.zeros(0)])
+
+    def __len__(self):
+        return len(self.epochs)
+
+    @property
+    def image_size(self):
+        # Size of the finest level, frames of coarser ones are scaled up to it
+        return max((grid.image_size for grid, _ in self.segments), key=lambda size: size[0] * size[1])
+
+    def find(self, epoch):
+        # Index of the last frame at or before epoch, negative epochs count from the end like indices
+        if epoch < 0:
+            return len(self) + epoch
+
+        return max(int(np.searchsorted(self.epochs, epoch, side="right")) - 1, 0)
+
+    def get(self, index):
+        # Grid and frame at index
+        segment = int(np.searchsorted(self.starts, index, side="right")) - 1
+        grid, frames = self.segments[segment]
+
+        return grid, frames[index - self.starts[segment]]
+
+    def render(self, index, image_size=None):
+        grid, frame = self.get(index)
+        image_size = image_size or self.image_size
+        scale = np.array(image_size) / np.array(grid.image_size)
+
+        return draw_triangles(grid.coords(frame["offsets"])[grid.triangles] * scale, frame["colors"], image_size)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("run", help="run directory or frames file")
+    parser.add_argument("--epochs", type=int, nargs="+", help="frames at or before these epochs, -1 is the last one")
+    parser.add_argument("--every", type=int, default=1, help="every n-th stored frame")
+    parser.add_argument("--output", metavar="DIR", help="write the frames as <epoch>.png into DIR")
+    parser.add_argument("--video", metavar="FILE", help="write the frames as animated .gif or .webp")
+    parser.add_argument("--duration", type=int, default=40, help="milliseconds per frame of the video")
+    parser.add_argument("--raw", action="store_true", help="write the frames as raw rgb24 to stdout, e.g. for ffmpeg")
+    parser.add_argument("--width", type=int, help="width the frames are drawn with, the height keeps the aspect ratio")
+
+    return parser.parse_args()
+
+def select_frames(reader, epochs, every):
+    if epochs:
+        return [reader.find(epoch) for epoch in epochs]
+
+    return list(range(0, len(reader), every))
+
+def render_frames(reader, indices, image_size):
+    for index in indices:
+        yield reader.epochs[index], reader.render(index, image_size)
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    path = os.path.join(arguments.run, FRAMES_FILE) if os.path.isdir(arguments.run) else arguments.run
+    reader = FrameReader(path)
+
+    if len(reader) == 0:
+        raise SystemExit(f"No frames in {path}")
+
+    indices = select_frames(reader, arguments.epochs, arguments.every)
+    image_size = reader.image_size
+
+    if arguments.width:
+        image_size = (arguments.width, round(image_size[1] * arguments.width / image_size[0]))
+
+    print(
+        f"{len(reader)} frames of epochs {reader.epochs[0]} - {reader.epochs[-1]} in {len(reader.segments)} segments, "
+        f"{os.path.getsize(path)} bytes, {len(indices)} selected at {image_size[0]}x{image_size[1]}", file=sys.stderr
+    )
+
+    if arguments.output:
+        os.makedirs(arguments.output, exist_ok=True)
+
+        for epoch, image in render_frames(reader, indices, image_size):
+            image.save(os.path.join(arguments.output, f"{epoch}.png"))
+
+    if arguments.video:
+        images = render_frames(reader, indices, image_size)
+        _, first = next(images)
+        first.save(
+            arguments.video, save_all=True, append_images=(image for _, image in images), duration=arguments.duration, loop=0
+        )
+
+    if arguments.raw:
+        print(f"ffmpeg -f rawvideo -pix_fmt rgb24 -s {image_size[0]}x{image_size[1]} -i - <output>", file=sys.stderr)
+
+        for _, image in render_frames(reader, indices, image_size):
+            sys.stdout.buffer.write(image.tobytes())
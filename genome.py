@@ -0,0 +1,266 @@
+from itertools import count
+from PIL import Image
+
+import aggdraw
+import numpy as np
+
+from base_classes import PROCESSING, RENDER_BACKEND
+from batch_evaluation import evaluate_population
+from label_map import get_triangle_errors
+from selection import TOURNAMENT_SIZE, select_parents
+from timings import timed
+
+import rasterizer
+import operators
+
+"""
+    - DNA and populations without any image, grid or palette bound to them
+    - Experiments subclass them and set reference, kernel, grid and utils as class attributes
+    - Importing this module has no side effects, so the runner can set up an experiment lazily
+"""
+
+def draw_triangles(vertices, colors, image_size):
+    # vertices: (T, 3, 2) coordinates, drawn with aggdraw in their order
+    image = Image.new("RGB", image_size, 0xFFFFFF)
+    draw = aggdraw.Draw(image)
+
+    for triangle, color in zip(vertices.reshape((-1, 6)).tolist(), colors.tolist()):
+        draw.polygon(triangle, aggdraw.Brush(tuple(color)))
+
+    draw.flush()
+
+    return image
+
+# Serial numbers of the DNA of this process, unlike id() never reused for a new DNA after one was freed
+serials = count()
+
+class DNA:
+    reference = None
+    kernel = None
+    grid = None
+    utils = None
+
+    def __init__(self, offsets=None, colors=None):
+        self.fitness = 0
+        self.serial = next(serials)
+
+        if offsets is not None and colors is not None:
+            self.offsets = offsets
+            self.colors = colors
+            return
+
+        # float32 (N, 2) offset of every point from its base position, uint8 (T, 3) color of every triangle
+        self.offsets = np.zeros((self.grid.points_count, 2), dtype=np.float32)
+        self.colors = self.utils.generate_colors(self.grid.triangle_count)
+
+    def copy(self):
+        return type(self)(self.offsets.copy(), self.colors.copy())
+
+    def nbytes(self):
+        return self.offsets.nbytes + self.colors.nbytes
+
+    def coords(self):
+        return self.grid.coords(self.offsets)
+
+    def draw(self):
+        return draw_triangles(self.coords()[self.grid.triangles], self.colors, self.grid.image_size)
+
+    def render(self, backend=None, out=None):
+        # Image as (H, W, 3) uint8 array, written into out if given
+        if (backend or RENDER_BACKEND) == "numpy":
+            return rasterizer.render(self.coords()[self.grid.triangles], self.colors, self.grid.image_size, out=out)
+
+        image = np.asarray(self.draw())
+
+        if out is None:
+            return image
+
+        out[...] = image
+
+        return out
+
+    def render_subsample(self, stride, phase):
+        # Pixels (phase + stride * i) of the image as the numpy backend colors them, on a grid scaled down by stride
+        width, height = self.grid.image_size
+        size = ((width - phase[0] + stride - 1) // stride, (height - phase[1] + stride - 1) // stride)
+        vertices = (self.coords()[self.grid.triangles] - np.array(phase) - 0.5) / stride + 0.5
+
+        return rasterizer.render(vertices, self.colors, size)
+
+    def get_fitness(self):
+        self.fitness = self.kernel.score(self.reference, self.render())
+
+        return self.fitness
+
+    def set_mutations(self, parent, points, colors):
+        # Used by the DeltaEvaluator to only redraw what changed compared to the parent
+        self.parent_serial = parent.serial
+        self.mutated_points = points
+        self.mutated_colors = colors
+
+    @staticmethod
+    def crossover(mom, mutation_propabilities):
+        return operators.mutate(mom, mutation_propabilities, mutation_propabilities)
+
+class Population:
+    # Children of the best DNA of the last epoch
+    dna_class = DNA
+    # The parent is part of the next population
+    elitism = False
+    # Mutations pick triangles and points in proportion to their error in the parent
+    error_targeting = False
+    # ScreeningEvaluator for the children of an elite, see screening.py
+    screening = None
+
+    def __init__(self, best_dna=None, mutation_rate=0.05, pool=None, evaluator=None, size=PROCESSING):
+        self.fitness = [0] * size
+        self.best_dna = None
+        self.mutation_rule = mutation_rate
+        self.pool = pool
+        self.evaluator = evaluator
+        self.population = [None] * size
+
+        if best_dna:
+            self.best_dna = best_dna
+            self.generate_new_population(best_dna)
+            return
+
+        self.population = [self.dna_class() for _ in range(size)]
+
+    def evaluate(self):
+        if self.evaluator:
+            return [self.evaluator.evaluate(dna) for dna in self.population]
+
+        if self.screening and self.elitism and self.best_dna is not None:
+            return self.evaluate_screened()
+
+        return self.evaluate_fully(self.population)
+
+    def evaluate_fully(self, population):
+        if self.pool:
+            return self.pool.evaluate(population)
+
+        return evaluate_population(population)
+
+    def evaluate_screened(self):
+        # The elite is the last DNA and keeps its fitness, rejected children keep their estimate
+        elite, children = self.population[-1], self.population[:-1]
+        passed, audited = self.screening.screen(elite, children)
+
+        fitness = self.evaluate_fully(passed + audited)
+
+        for dna, value in zip(passed + audited, fitness):
+            dna.fitness = value
+
+        self.screening.record_audit(audited, fitness[len(passed):])
+
+        return [dna.fitness for dna in children] + [elite.fitness]
+
+    def run_epoch(self):
+        max, min = 0, np.inf
+        best = None
+
+        with timed("evaluate"):
+            population_fitness = self.evaluate()
+
+        for id, fitness in enumerate(population_fitness):
+            self.fitness[id] = fitness
+            self.population[id].fitness = fitness
+
+            if fitness > max:
+                max = fitness
+                best = self.population[id]
+            if fitness < min:
+                min = fitness
+
+        self.best_dna = best
+
+        if self.evaluator:
+            with timed("set_parent"):
+                self.evaluator.set_parent(best)
+
+        # A parent surviving the epoch keeps its errors
+        if self.error_targeting and getattr(best, "errors", None) is None:
+            with timed("errors"):
+                best.errors = get_triangle_errors(best, self.evaluator)
+
+        return self.best_dna, max, min
+
+    def generate_new_population(self, best_dna):
+        new_population = []
+
+        with timed("breed"):
+            for _ in range(len(self.population) - int(self.elitism)):
+                new_population.append(self.dna_class.crossover(best_dna, self.mutation_rule))
+
+        if self.elitism:
+            new_population.append(best_dna)
+
+        self.population = new_population
+
+class MultiParentPopulation:
+    # Children of two parents picked by selection, see selection.py
+    dna_class = DNA
+    selection = "roulette"
+    tournament_size = TOURNAMENT_SIZE
+
+    def __init__(self, mutation_rate=0.005, pool=None, size=PROCESSING):
+        self.size = size
+        self.fitness = [0] * (size + 1)
+        self.best_dna = None
+        self.best_fitness = 0
+        self.mutation_rule = mutation_rate
+        self.pool = pool
+        self.population = [None] * size
+
+        self.population = [self.dna_class() for _ in range(size)]
+
+    def evaluate(self):
+        if self.pool:
+            return self.pool.evaluate(self.population)
+
+        return evaluate_population(self.population)
+
+    def run_epoch(self):
+        max, min = 0, np.inf
+        best = None
+
+        with timed("evaluate"):
+            population_fitness = self.evaluate()
+
+        for id, fitness in enumerate(population_fitness):
+            self.fitness[id] = fitness
+            self.population[id].fitness = fitness
+
+            if fitness > max:
+                max = fitness
+                best = self.population[id]
+            if fitness < min:
+                min = fitness
+
+        if max > self.best_fitness:
+            self.best_dna = best
+            self.best_fitness = max
+            self.fitness[self.size] = max
+
+        self.max = max
+        self.min = min
+
+        self.generate_new_population()
+
+        return self.best_dna, self.best_fitness, min
+
+    def generate_new_population(self):
+        new_population = []
+
+        # The best DNA so far takes part as the last one
+        with timed("selection"):
+            moms, dads = select_parents(self.selection, self.fitness, self.size, self.tournament_size)
+
+        self.population.append(self.best_dna)
+
+        with timed("breed"):
+            for mom_index, dad_index in zip(moms.tolist(), dads.tolist()):
+                new_population.append(self.dna_class.crossover(self.population[mom_index], self.population[dad_index], self.mutation_rule))
+
+        self.population = new_population
@@ -0,0 +1,160 @@
+from multiprocessing import Pipe
+
+import numpy as np
+import random
+import signal
+import pickle
+
+from base_classes import ISOLATION_CYCLES, RNG, get_fork_context
+from checkpoint import save_checkpoint
+from strategies import copy_migrant
+
+"""
+    - Island model: every worker process owns a strategy with its own population and evolves it on its own
+    - Islands only talk to the master every isolation_cycles generations, to send their best DNA and get migrants
+    - Migrants travel along a topology, an island takes a migrant if it beats its own best DNA
+"""
+
+# Indices of the islands an island gets its migrants from
+TOPOLOGIES = {
+    "ring": lambda index, amount: [(index - 1) % amount],
+    "fully_connected": lambda index, amount: [source for source in range(amount) if source != index],
+    "none": lambda index, amount: []
+}
+
+def run_island(strategy, connection, seed):
+    # Ctrl+C is handled by the master, which then terminates the islands
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Forked islands start with the random state of the master
+    RNG.bit_generator.state = np.random.default_rng(seed).bit_generator.state
+    random.seed(int(seed.generate_state(1)[0]))
+
+    while True:
+        message = connection.recv()
+
+        if message is None:
+            break
+
+        cycles, migrants = message
+
+        for migrant in migrants:
+            strategy.add_migrant(migrant)
+
+        for _ in range(cycles):
+            best_dna, max, min = strategy.run_epoch()
+
+        # Only the genome, not what the DNA carries for its island like its errors
+        connection.send((copy_migrant(best_dna), max, min, strategy.mutation_factor, strategy.mutation_rates))
+
+    connection.close()
+
+class IslandModel:
+    def __init__(self, strategy, islands, isolation_cycles=ISOLATION_CYCLES, topology="ring"):
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology {topology}")
+
+        self.strategy = strategy
+        self.dna_class = strategy.dna_class
+        self.generations = isolation_cycles
+        self.sources = [TOPOLOGIES[topology](index, islands) for index in range(islands)]
+
+        self.bests = [None] * islands
+        self.migrants = [[] for _ in range(islands)]
+        self.mutation_factor = 1
+        self.mutation_rates = strategy.mutation_rates
+        self.ipc_bytes = 0
+        self.pool = None
+
+        self.connections = []
+        self.processes = []
+
+        # Workers are forked, so every island starts with its own copy of the strategy and its bound classes
+        context = get_fork_context()
+
+        for seed in np.random.SeedSequence(RNG.integers(1 << 32)).spawn(islands):
+            connection, island_connection = Pipe()
+            process = context.Process(target=run_island, args=(strategy, island_connection, seed), daemon=True)
+            process.start()
+
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def run_epoch(self):
+        # Runs isolation_cycles generations on every island, returns the best DNA of all islands
+        self.ipc_bytes = 0
+
+        for index, migrants in enumerate(self.migrants):
+            self.send(index, (self.generations, migrants))
+
+        results = [self.receive(index) for index in range(len(self.connections))]
+
+        self.bests = [best_dna for best_dna, _, _, _, _ in results]
+        self.migrants = [[self.bests[source] for source in sources] for sources in self.sources]
+        self.mutation_factor = np.mean([mutation_factor for _, _, _, mutation_factor, _ in results])
+        self.mutation_rates = tuple(np.mean([mutation_rates for _, _, _, _, mutation_rates in results], axis=0))
+
+        best_dna, max, _, _, _ = results[np.argmax([max for _, max, _, _, _ in results])]
+
+        return best_dna, max, np.min([min for _, _, min, _, _ in results])
+
+    def get_death(self, index):
+        # An island that died, like on an exception in its strategy, closed its end of the pipe
+        self.processes[index].join()
+
+        exitcode = self.processes[index].exitcode
+
+        return RuntimeError(f"Island {index} died with exit code {exitcode}, see its traceback above")
+
+    # Messages are pickled once by the master and counted in ipc_bytes, islands use send and recv of their end
+    def send(self, index, message):
+        if not self.processes[index].is_alive():
+            raise self.get_death(index)
+
+        data = pickle.dumps(message)
+        self.ipc_bytes += len(data)
+
+        try:
+            self.connections[index].send_bytes(data)
+        except BrokenPipeError:
+            raise self.get_death(index) from None
+
+    def receive(self, index):
+        try:
+            data = self.connections[index].recv_bytes()
+        except EOFError:
+            raise self.get_death(index) from None
+
+        self.ipc_bytes += len(data)
+
+        return pickle.loads(data)
+
+    def save_checkpoint(self, dir, epoch, **values):
+        # Only the best DNA of every island is kept, the random state of the islands is not restored
+        best_dna = max(self.bests, key=lambda dna: dna.fitness)
+        save_checkpoint(dir, epoch, best_dna, self.bests, self.mutation_factor, **values)
+
+    def resume(self, checkpoint):
+        # Every island starts from its best DNA of the checkpoint
+        self.migrants = [[dna] for dna in checkpoint["population"]]
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+
+        for process in self.processes:
+            process.join()
+
+    def terminate(self):
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from base_classes import PROCESSING
+
+import rasterizer
+
+"""
+    - Label map: index of the triangle covering every pixel, -1 for the background
+    - Rasterized once per geometry and cached by the offsets of the DNA until a point moves
+    - Per pixel values are grouped by triangle with np.bincount over the label map
+"""
+
+class LabelMapCache:
+    def __init__(self, grid, cache_size=PROCESSING * 2):
+        self.grid = grid
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def get(self, offsets):
+        key = offsets.tobytes()
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        labels = rasterizer.rasterize(self.grid.coords(offsets)[self.grid.triangles], self.grid.image_size)
+
+        self.cache[key] = labels
+
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return labels
+
+def triangle_errors(kernel, scores, labels, triangle_count):
+    # scores: (H, W) fitness of every pixel, the error is what a pixel lacks to match the reference exactly
+    errors = kernel.table[0] * 3 - scores
+    covered = labels >= 0
+
+    return np.bincount(labels[covered], weights=errors[covered], minlength=triangle_count)
+
+# One label map cache per grid, for DNA without an evaluator keeping their per pixel scores. Only the grids used
+# last are kept, a batch or multi resolution run creates a new grid for every job or level
+GRID_CACHES = 4
+caches = OrderedDict()
+
+def get_triangle_errors(dna, evaluator=None):
+    # The evaluator keeps the per pixel scores of its parent, otherwise dna is rendered again
+    if evaluator:
+        return evaluator.get_triangle_errors()
+
+    if dna.grid in caches:
+        caches.move_to_end(dna.grid)
+    else:
+        caches[dna.grid] = LabelMapCache(dna.grid, 2)
+
+        if len(caches) > GRID_CACHES:
+            caches.popitem(last=False)
+
+    scores = np.sum(dna.kernel.pixel_scores(dna.reference, dna.render()), axis=2)
+
+    return triangle_errors(dna.kernel, scores, caches[dna.grid].get(dna.offsets), dna.grid.triangle_count)
@@ -0,0 +1,169 @@
+from collections import deque
+from PIL import Image
+
+import numpy as np
+
+from evaluation_pool import EvaluationPool
+from experiment import Experiment
+
+"""
+    - Coarse to fine evolution: the run starts on the reference downscaled by 2 ** (levels - 1) and works its way up
+    - Every level has half the width and height of the next finer one, so a generation there scores 1/4 of the pixels
+    - When the best fitness improved less than plateau_threshold over plateau_epochs, the best DNA is promoted
+    - Promoting scales the offsets by the ratio of the distances between points, with subdivide the grid of a coarser
+      level has half the intervals and the new points are put halfway, so the triangles keep their shape and color
+    - Snapshots and fitness of a coarse level are those of its downscaled image
+"""
+
+def build_pyramid(reference, levels):
+    # Finest level first
+    image = Image.fromarray(reference)
+
+    return [reference] + [np.asarray(image.reduce(2 ** level)) for level in range(1, levels)]
+
+def get_level_points(points_amount, level, subdivide):
+    if not subdivide:
+        return points_amount
+
+    if (points_amount - 1) % 2 ** level:
+        raise ValueError(f"points_amount - 1 has to be divisible by {2 ** level} to subdivide {level} times")
+
+    return (points_amount - 1) // 2 ** level + 1
+
+def create_level(experiment, reference, points_amount):
+    # Experiment of one level, it shares the palette of the full resolution image
+    level = Experiment({**experiment.config, "points_amount": points_amount})
+    level.image = (reference, (reference.shape[1], reference.shape[0]), experiment.image[2])
+    level.palette = experiment.palette
+
+    return level
+
+def get_coarse_triangles(coarse, fine, step):
+    # Color index of the coarse triangle every triangle of the fine grid lies in
+    x = fine.x_index[fine.triangles].mean(axis=1) / step
+    y = fine.y_index[fine.triangles].mean(axis=1) / step
+    cell_x, cell_y = np.floor(x), np.floor(y)
+
+    # Below the diagonal of a cell is the first triangle of its color index, above it the second
+    upper = (x - cell_x) > (y - cell_y)
+
+    return (cell_x * 2 + cell_y * (coarse.points_amount - 1) * 2 + upper).astype(np.int64)
+
+def promote(dna, coarse, fine):
+    # Offsets and colors of dna on the coarse grid moved to the fine grid
+    step = (fine.points_amount - 1) // (coarse.points_amount - 1)
+    scale = np.array(fine.distance_between_points) * step / np.array(coarse.distance_between_points)
+
+    offsets = np.zeros((fine.points_amount, fine.points_amount, 2), dtype=np.float32)
+    offsets[::step, ::step] = dna.offsets.reshape((coarse.points_amount, coarse.points_amount, 2)) * scale
+
+    if step == 2:
+        # New points halfway on the edges and on the diagonal of every cell
+        offsets[1::2, ::2] = (offsets[:-1:2, ::2] + offsets[2::2, ::2]) / 2
+        offsets[::2, 1::2] = (offsets[::2, :-1:2] + offsets[::2, 2::2]) / 2
+        offsets[1::2, 1::2] = (offsets[:-1:2, :-1:2] + offsets[2::2, 2::2]) / 2
+
+    colors = dna.colors[get_coarse_triangles(coarse, fine, step)]
+
+    # Points of the finer grid can't move as far from their base position
+    return fine.clip(offsets.reshape((-1, 2))), colors.copy()
+
+class MultiResolution:
+    def __init__(self, strategy_class, experiment):
+        self.strategy_class = strategy_class
+        self.config = experiment.config
+
+        levels = self.config["levels"]
+        references = build_pyramid(experiment.reference, levels)
+
+        self.experiments = [
+            create_level(experiment, reference, get_level_points(self.config["points_amount"], level, self.config["subdivide"]))
+            for level, reference in enumerate(references)
+        ]
+
+        self.history = deque(maxlen=self.config["plateau_epochs"] + 1)
+        self.generations = 1
+        self.best_dna = None
+        self.strategy = None
+        self.evaluation_pool = None
+        self.pool = None
+        self.level = None
+
+        self.set_level(levels - 1)
+        self.dna_class = self.strategy.dna_class
+
+    @property
+    def mutation_factor(self):
+        return self.strategy.mutation_factor
+
+    @property
+    def mutation_rates(self):
+        return self.strategy.mutation_rates
+
+    @property
+    def ipc_bytes(self):
+        return self.evaluation_pool.ipc_bytes
+
+    def set_level(self, level):
+        if self.evaluation_pool is not None:
+            self.evaluation_pool.close()
+
+        coarse = self.experiments[self.level].grid if self.level is not None else None
+        experiment = self.experiments[level]
+
+        # Binds the DNA class to the reference and grid of the level
+        self.level = level
+        self.strategy = self.strategy_class(experiment)
+        self.history.clear()
+
+        # Workers are forked after binding, so they evaluate against the level as well
+        self.evaluation_pool = EvaluationPool(self.config["workers"], self.config["shared_population"])
+        self.strategy.pool = self.evaluation_pool
+
+        print(f"Level {level}: {experiment.image_size[0]}x{experiment.image_size[1]}, {experiment.grid.points_amount} points")
+
+        if self.best_dna is not None:
+            dna = self.strategy.dna_class(*promote(self.best_dna, coarse, experiment.grid))
+            dna.get_fitness()
+
+            self.strategy.add_migrant(dna)
+
+    def is_plateau(self, max):
+        self.history.append(max)
+
+        if len(self.history) < self.history.maxlen:
+            return False
+
+        return self.history[-1] - self.history[0] <= self.config["plateau_threshold"] * abs(self.history[0])
+
+    def run_epoch(self):
+        self.best_dna, max, min = self.strategy.run_epoch()
+
+        if self.level > 0 and self.is_plateau(max):
+            self.set_level(self.level - 1)
+
+        return self.best_dna, max, min
+
+    def save_checkpoint(self, dir, epoch, **values):
+        self.strategy.save_checkpoint(dir, epoch, level=self.level, **values)
+
+    def resume(self, checkpoint):
+        # Runs started before the last promotion continue on their level
+        self.best_dna = None
+        self.set_level(checkpoint["level"])
+        self.strategy.resume(checkpoint)
+
+    def close(self):
+        self.evaluation_pool.close()
+
+    def terminate(self):
+        self.evaluation_pool.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,46 @@
+"""
+    - Mutation rates of single parent runs adapted to how often children beat their parent, instead of drawn every epoch
+    - Point and color rate are adapted separately, a child only counts for the kinds of genes it had mutations of
+    - 1/5th success rule: a rate grows by factor for every child better than its parent and shrinks for every other
+      child, so that it settles where a fifth of the children it mutated improved
+    - Rates stay between one expected mutation per DNA and max_rate, a rate of 0 keeps that kind of mutation off
+"""
+
+# Ways the runner can change the mutation rates during a run, "random" is the factor the scripts used to draw
+MUTATION_CONTROLS = ("random", "success_rule")
+
+FACTOR = 1.2
+# Share of improving children the rates settle at
+TARGET_SUCCESS = 1 / 5
+MAX_RATE = 0.1
+
+class SuccessRule:
+    def __init__(self, point_mutation, color_mutation, factor=FACTOR, max_rate=MAX_RATE):
+        self.rates = [point_mutation, color_mutation]
+        self.factor = factor
+        self.max_rate = max_rate
+
+        # TARGET_SUCCESS successes and the failures between them cancel out
+        self.shrink = factor ** (-TARGET_SUCCESS / (1 - TARGET_SUCCESS))
+
+    @property
+    def point_mutation(self):
+        return self.rates[0]
+
+    @property
+    def color_mutation(self):
+        return self.rates[1]
+
+    def update(self, parent, children):
+        # children are scored DNA created by operators.mutate from parent, the parent itself is skipped
+        genes = (len(parent.offsets), len(parent.colors))
+
+        for dna in children:
+            if dna is parent:
+                continue
+
+            change = self.factor if dna.fitness > parent.fitness else self.shrink
+
+            for kind, mutated in enumerate((dna.mutated_points, dna.mutated_colors)):
+                if len(mutated) > 0:
+                    self.rates[kind] = min(max(self.rates[kind] * change, 1 / genes[kind]), self.max_rate)
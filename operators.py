@@ -0,0 +1,69 @@
+import numpy as np
+
+from base_classes import RNG
+
+"""
+    - Mutation and crossover working on the arrays of the DNA instead of looping over every gene
+    - Every gene mutates with the given rate, so the amount of mutations is drawn from a binomial distribution
+    - The mutated genes are then picked in one call and changed with array operations
+    - With an error per triangle of the parent, triangles and their points are picked in proportion to their error
+"""
+
+def pick_mutations(amount, mutation_rate, max_mutations=None, weights=None):
+    count = RNG.binomial(amount, mutation_rate)
+
+    if max_mutations is not None:
+        count = min(count, max_mutations)
+
+    if weights is None or np.sum(weights) <= 0:
+        return RNG.choice(amount, count, replace=False)
+
+    # Genes without weight are never picked
+    count = min(count, np.count_nonzero(weights))
+
+    return RNG.choice(amount, count, replace=False, p=weights / np.sum(weights))
+
+def get_point_errors(grid, triangle_errors):
+    # Error of a point is the error of all triangles sharing it, points which can't move get none
+    errors = np.bincount(grid.triangles.ravel(), weights=np.repeat(triangle_errors, 3), minlength=grid.points_count)
+
+    return errors * np.any(grid.movable, axis=1)
+
+def apply_mutations(dna, points, colors):
+    dna.grid.mutate(dna.offsets, points)
+    dna.colors[colors] = dna.utils.generate_colors(len(colors))
+
+    return dna
+
+def mutate(mom, point_mutation, color_mutation, max_mutations=None):
+    # Child of a single parent, with max_mutations points are mutated first and colors get what is left
+    triangle_errors = getattr(mom, "errors", None)
+    point_errors = None
+
+    if triangle_errors is not None:
+        point_errors = get_point_errors(mom.grid, triangle_errors)
+
+    points = pick_mutations(len(mom.offsets), point_mutation, max_mutations, point_errors)
+
+    if max_mutations is not None:
+        max_mutations -= len(points)
+
+    colors = pick_mutations(len(mom.colors), color_mutation, max_mutations, triangle_errors)
+
+    dna = apply_mutations(mom.copy(), points, colors)
+    dna.set_mutations(mom, points, colors)
+
+    return dna
+
+def uniform_crossover(mom, dad, point_mutation, color_mutation):
+    # Every gene is taken from mom or dad with equal chance, then mutated
+    from_mom = RNG.random(len(mom.offsets)) < 0.5
+    offsets = np.where(from_mom[:, None], mom.offsets, dad.offsets)
+
+    from_mom = RNG.random(len(mom.colors)) < 0.5
+    colors = np.where(from_mom[:, None], mom.colors, dad.colors)
+
+    points = pick_mutations(len(offsets), point_mutation)
+    mutated_colors = pick_mutations(len(colors), color_mutation)
+
+    return apply_mutations(type(mom)(offsets, colors), points, mutated_colors)
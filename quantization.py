@@ -0,0 +1,90 @@
+import numpy as np
+
+from base_classes import BaseUtils
+from reference_cache import get_colors, load_palette
+
+"""
+    - Palettes of a reference image, computed on a fixed subsample of its pixels
+    - "median_cut" splits the box of colors with the most spread at the median of its widest channel until there are
+      size boxes, "kmeans" refines the median cut palette with a few Lloyd iterations
+    - "gradient" is the reduction the scripts started with (BaseUtils.reduce_color_amount), size is ignored for it
+    - Palettes are cached next to the image per image hash, method, size and sample, see reference_cache.py
+"""
+
+PALETTE_METHODS = ("median_cut", "kmeans", "gradient")
+PALETTE_SIZE = 256
+# Pixels the palette is computed on
+SAMPLE = 1 << 16
+KMEANS_ITERATIONS = 8
+
+def get_sample(reference, sample=SAMPLE):
+    pixels = reference.reshape((-1, 3))
+
+    if len(pixels) <= sample:
+        return np.array(pixels)
+
+    # Same pixels every time, so a cached palette is the one that would be computed
+    return pixels[np.sort(np.random.default_rng(0).choice(len(pixels), sample, replace=False))]
+
+def get_box(pixels):
+    # Pixels, widest channel and its spread weighted by the amount of pixels
+    spread = np.ptp(pixels, axis=0)
+    channel = int(np.argmax(spread))
+
+    return pixels, channel, int(spread[channel]) * len(pixels)
+
+def median_cut(pixels, size=PALETTE_SIZE):
+    boxes = [get_box(pixels)]
+
+    while len(boxes) < size:
+        index = max(range(len(boxes)), key=lambda index: boxes[index][2])
+        box, channel, score = boxes[index]
+
+        if score == 0:
+            break
+
+        del boxes[index]
+
+        half = len(box) // 2
+        box = box[np.argpartition(box[:, channel], half)]
+        boxes += [get_box(box[:half]), get_box(box[half:])]
+
+    return np.array([box.mean(axis=0) for box, _, _ in boxes]).round().astype(np.uint8)
+
+def kmeans(pixels, size=PALETTE_SIZE, iterations=KMEANS_ITERATIONS):
+    centers = median_cut(pixels, size).astype(np.float32)
+    pixels = pixels.astype(np.float32)
+
+    for _ in range(iterations):
+        # Squared distance without the norm of the pixels, which is the same for every center
+        labels = np.argmin(np.sum(centers ** 2, axis=1) - 2 * pixels @ centers.T, axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        filled = counts > 0
+
+        for channel in range(3):
+            sums = np.bincount(labels, weights=pixels[:, channel], minlength=len(centers))
+            centers[filled, channel] = sums[filled] / counts[filled]
+
+    return np.unique(centers.round().astype(np.uint8), axis=0)
+
+def quantize(reference, method="median_cut", size=PALETTE_SIZE, sample=SAMPLE):
+    # (C, 3) uint8 palette of an (H, W, 3) uint8 reference
+    if method not in PALETTE_METHODS:
+        raise ValueError(f"Unknown palette method {method}")
+
+    if method == "gradient":
+        return np.array(BaseUtils.reduce_color_amount([tuple(color) for color in get_colors(reference).tolist()]), dtype=np.uint8)
+
+    pixels = get_sample(reference, sample)
+
+    if method == "kmeans":
+        return kmeans(pixels, size)
+
+    return median_cut(pixels, size)
+
+def get_palette(image_path, reference, method="median_cut", size=PALETTE_SIZE, sample=SAMPLE):
+    # Palette as list of color tuples, like the colors of get_image_values
+    key = "gradient" if method == "gradient" else f"{method}-{size}-{sample}"
+    palette = load_palette(image_path, key, lambda: quantize(reference, method, size, sample))
+
+    return [tuple(color) for color in palette.tolist()]
@@ -0,0 +1,105 @@
+import numpy as np
+
+"""
+    - Renders the triangle grid with NumPy instead of drawing every triangle with aggdraw
+    - For every row of the bounding box of a triangle the span of pixel centers inside its three edges is computed
+    - Spans of all triangles are filled at once, later triangles overwrite earlier ones like with aggdraw
+    - No anti aliasing, edge pixels can differ from aggdraw
+    - Only faster than aggdraw on fine grids: slower at 20 points, faster from about 30 - 50 points on, see
+      test_rasterizer.py for how close both are
+"""
+
+BACKGROUND = (0xFF, 0xFF, 0xFF)
+
+EPSILON = 1e-9
+
+def rasterize(vertices, size, origin=(0, 0)):
+    # vertices: (T, 3, 2) coordinates of the triangles, returns the index of the triangle covering each pixel, -1 for none
+    width, height = size
+    labels = np.full(width * height, -1, dtype=np.int32)
+
+    if len(vertices) == 0:
+        return labels.reshape((height, width))
+
+    vertices = np.asarray(vertices, dtype=np.float64) - origin
+    a, b, c = vertices[:, 0], vertices[:, 1], vertices[:, 2]
+
+    y_min = np.clip(np.floor(vertices[:, :, 1].min(axis=1)), 0, height).astype(np.int64)
+    y_max = np.clip(np.ceil(vertices[:, :, 1].max(axis=1)), 0, height).astype(np.int64)
+
+    box_height = np.max(y_max - y_min)
+
+    if box_height <= 0:
+        return labels.reshape((height, width))
+
+    rows = y_min[:, None] + np.arange(box_height)
+    center_y = rows + 0.5
+
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    sign = np.where(area < 0, -1.0, 1.0)
+
+    low = np.full(rows.shape, -np.inf)
+    high = np.full(rows.shape, np.inf)
+
+    for p, q in ((a, b), (b, c), (c, a)):
+        # Edge function as e_x * x + e_y * y + e_c, positive on the inner side of the edge
+        e_x = ((p[:, 1] - q[:, 1]) * sign)[:, None]
+        e_y = ((q[:, 0] - p[:, 0]) * sign)[:, None]
+        e_c = -(e_x * p[:, 0, None] + e_y * p[:, 1, None])
+
+        value = e_y * center_y + e_c
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bound = -value / e_x
+
+        low = np.where(e_x > 0, np.maximum(low, bound), low)
+        high = np.where(e_x < 0, np.minimum(high, bound), high)
+
+        # Horizontal edges keep or drop the whole row
+        low = np.where((e_x == 0) & (value < -EPSILON), np.inf, low)
+
+    # Pixels exactly on a shared edge go to both triangles instead of none
+    start = np.clip(np.ceil(low - 0.5 - EPSILON), 0, width)
+    end = np.clip(np.floor(high - 0.5 + EPSILON), -1, width - 1)
+
+    lengths = (end - start + 1).astype(np.int64)
+    lengths[(rows >= y_max[:, None]) | (area == 0)[:, None] | (lengths < 0)] = 0
+    lengths = lengths.ravel()
+
+    first = (rows * width + start.astype(np.int64)).ravel()
+    triangles = np.repeat(np.arange(len(vertices), dtype=np.int32), box_height)
+
+    # Spans are ordered by triangle, for repeated pixels the last (highest) triangle is assigned
+    offsets = np.arange(np.sum(lengths)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    labels[np.repeat(first, lengths) + offsets] = np.repeat(triangles, lengths)
+
+    return labels.reshape((height, width))
+
+def paint(labels, colors, out=None):
+    palette = np.vstack([np.asarray(colors, dtype=np.uint8).reshape((-1, 3)), BACKGROUND]).astype(np.uint8)
+
+    # -1 picks the background appended at the end of the palette
+    return np.take(palette, labels, axis=0, out=out)
+
+def render(vertices, colors, size, origin=(0, 0), out=None):
+    return paint(rasterize(vertices, size, origin), colors, out)
+
+def get_edges(labels):
+    # Pixels next to a pixel covered by another triangle, anti aliasing only changes these
+    edges = np.zeros(labels.shape, dtype=bool)
+
+    horizontal = labels[:, 1:] != labels[:, :-1]
+    vertical = labels[1:, :] != labels[:-1, :]
+
+    edges[:, 1:] |= horizontal
+    edges[:, :-1] |= horizontal
+    edges[1:, :] |= vertical
+    edges[:-1, :] |= vertical
+
+    return edges
+
+def compare(image, other, labels, tolerance=1):
+    # Share of pixels more than one pixel away from an edge with a channel differing more than tolerance
+    difference = np.max(np.abs(np.asarray(image, dtype=np.int16) - np.asarray(other, dtype=np.int16)), axis=2)
+
+    return np.mean((difference > tolerance) & ~get_edges(labels)), np.mean(difference)
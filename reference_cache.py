@@ -0,0 +1,82 @@
+from PIL import Image
+
+import numpy as np
+import hashlib
+import os
+
+"""
+    - Decoded reference images are cached as .npy files next to the image, keyed by the hash of the image file
+    - The cache is opened as a read only memory map, restarts on the same image skip decoding
+    - Forked workers share the mapped pages of the master instead of holding a copy of the reference
+    - Palettes are cached the same way, per image hash and the settings they were computed with
+"""
+
+def get_file_hash(path):
+    digest = hashlib.sha1()
+
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()[:16]
+
+def get_cache_prefix(image_path):
+    directory, name = os.path.split(os.path.abspath(image_path))
+
+    return os.path.join(directory, f".{name}.{get_file_hash(image_path)}")
+
+def get_cache_paths(image_path):
+    prefix = get_cache_prefix(image_path)
+
+    return prefix + ".reference.npy", prefix + ".colors.npy"
+
+def get_colors(reference):
+    # All distinct colors of an (H, W, 3) uint8 image as (C, 3) uint8
+    # Packed into one integer per pixel, np.unique over rows is a lot slower
+    packed = np.unique(reference.reshape((-1, 3)).astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32))
+
+    return np.stack([packed >> 16, packed >> 8, packed], axis=1).astype(np.uint8)
+
+def decode(image_path):
+    reference = np.asarray(Image.open(image_path).convert("RGB"))
+
+    return reference, get_colors(reference)
+
+def save(path, array):
+    # Written into a temporary file first, so other processes never map a half written cache
+    with open(path + ".tmp", "wb") as file:
+        np.save(file, array)
+
+    os.replace(path + ".tmp", path)
+
+def load(image_path):
+    reference_path, colors_path = get_cache_paths(image_path)
+
+    if not (os.path.exists(reference_path) and os.path.exists(colors_path)):
+        reference, colors = decode(image_path)
+
+        try:
+            save(reference_path, reference)
+            save(colors_path, colors)
+        except OSError:
+            # Directory of the image isn't writable, run without a cache
+            return reference, colors
+
+    # np.asarray drops the memmap subclass, results of operations on the reference are plain arrays
+    return np.asarray(np.load(reference_path, mmap_mode="r")), np.load(colors_path)
+
+def load_palette(image_path, key, compute):
+    # compute is only called if there is no palette cached for key
+    path = f"{get_cache_prefix(image_path)}.palette.{key}.npy"
+
+    if os.path.exists(path):
+        return np.load(path)
+
+    palette = compute()
+
+    try:
+        save(path, palette)
+    except OSError:
+        pass
+
+    return palette
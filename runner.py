@@ -0,0 +1,248 @@
+from contextlib import ExitStack
+
+import argparse
+import cProfile
+import json
+import time
+import os
+
+startup_start = time.time()
+
+from base_classes import create_dir_name, save_metadata
+from checkpoint import CHECKPOINT_FREQUENCY, load_checkpoint, truncate_log
+from evaluation_pool import EvaluationPool
+from experiment import Experiment
+from frames import open_frames
+from islands import IslandModel
+from multi_resolution import MultiResolution
+from strategies import STRATEGIES
+from timings import timed
+from writers import LogWriter, SnapshotWriter
+
+import timings
+
+"""
+    - Single entry point for all experiments: python runner.py [config.json] [--resume <dir>]
+    - The config picks a strategy and its settings, missing keys are taken from DEFAULT_CONFIG in experiment.py
+    - Nothing is loaded on import, the experiment builds image, palette and grid once when the strategy needs them
+    - Startup time (imports and every setup step) is printed and stored in the metadata of the run
+    - With timings set, the time of every phase of an epoch goes to timings.jsonl, one line per epoch
+    - Logs and snapshots are written by background threads, see writers.py
+    - With snapshots set to "frames" the best DNA is appended to one frames.bin instead of a PNG each, see frames.py
+"""
+
+import_time = time.time() - startup_start
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", nargs="?", help="JSON file with the config of the experiment")
+    parser.add_argument("--resume", metavar="DIR", help="continue the run in DIR from its last checkpoint")
+
+    return parser.parse_args()
+
+def load_config(path):
+    if path is None:
+        return {}
+
+    with open(path) as file:
+        return json.load(file)
+
+def is_due(epoch, generations, frequency):
+    # Whether a multiple of frequency is among the generations starting at epoch
+    return (epoch + generations - 1) // frequency * frequency >= epoch
+
+def save_snapshot(snapshots, strategy, best_dna, path):
+    evaluator = getattr(strategy, "evaluator", None)
+
+    if evaluator is not None and evaluator.parent is best_dna:
+        # Rendered by the delta evaluator already, copied as it patches its canvas in place
+        snapshots.save(evaluator.canvas.copy(), path)
+    else:
+        snapshots.save_dna(best_dna, path)
+
+def create_strategy(experiment):
+    # Strategy of the experiment, and the runtime owning the processes it runs on if it has its own
+    if experiment.config["strategy"] not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {experiment.config['strategy']}")
+
+    strategy_class = STRATEGIES[experiment.config["strategy"]]
+    runtime = None
+
+    if experiment.config["levels"] > 1:
+        if experiment.config["islands"]:
+            raise ValueError("Islands can't be combined with levels")
+
+        strategy = runtime = MultiResolution(strategy_class, experiment)
+    else:
+        strategy = strategy_class(experiment)
+
+    if experiment.config["islands"]:
+        strategy = runtime = IslandModel(
+            strategy, experiment.config["islands"], experiment.config["isolation_cycles"], experiment.config["topology"]
+        )
+
+    return strategy, runtime
+
+def create_run_dir(dir, experiment, startup):
+    os.mkdir(dir)
+
+    save_metadata(dir, {
+        "config": experiment.config,
+        "startup": startup
+    })
+
+    with open(dir + "/log.csv", "a") as file:
+        file.write("epoch, max, min, mutation_rate, point_mutation, color_mutation, ipc_bytes\n")
+
+class Run:
+    # Writers and progress of a strategy running in dir, every call of run_epoch runs, logs and saves one epoch
+    def __init__(self, experiment, strategy, runtime, dir, epoch=0, verbose=True):
+        self.config = experiment.config
+        self.strategy = strategy
+        self.runtime = runtime
+        self.dir = dir
+        self.epoch = epoch
+        self.verbose = verbose
+        self.best_dna = None
+        self.max = 0
+        # Seconds spent in run_epoch
+        self.seconds = 0
+
+        self.stack = ExitStack()
+        self.log = self.stack.enter_context(LogWriter(dir + "/log.csv"))
+        self.snapshots = self.stack.enter_context(SnapshotWriter())
+        self.timings_log = self.stack.enter_context(LogWriter(dir + "/timings.jsonl")) if timings.enabled else None
+        self.frames = self.stack.enter_context(open_frames(dir, self.config["snapshots"] == "frames"))
+
+        strategy.pool = runtime
+
+    @property
+    def ipc_bytes(self):
+        # A strategy evaluating everything in the master runs without a runtime
+        return self.runtime.ipc_bytes if self.runtime is not None else 0
+
+    @property
+    def done(self):
+        # Whether a stop criterion of the config is met, a run without any goes on until it is interrupted
+        epochs, target_fitness, max_seconds = self.config["epochs"], self.config["target_fitness"], self.config["max_seconds"]
+
+        return (
+            (epochs is not None and self.epoch >= epochs)
+            or (target_fitness is not None and self.max >= target_fitness)
+            or (max_seconds is not None and self.seconds >= max_seconds)
+        )
+
+    def run_epoch(self):
+        strategy, dir, epoch = self.strategy, self.dir, self.epoch
+        profile_frequency = self.config["profile_frequency"]
+        epoch_start = time.perf_counter()
+        profiler = None
+
+        if profile_frequency and is_due(epoch, strategy.generations, profile_frequency):
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        best_dna, max, min = strategy.run_epoch()
+
+        if profiler:
+            profiler.disable()
+
+        generations = strategy.generations
+        # Logged with the last generation that ran
+        last_epoch = epoch + generations - 1
+
+        with timed("log"):
+            if self.verbose:
+                print(f"{str(last_epoch).ljust(10)} | {str(round(max, 5)).ljust(20)} | {str(round(min, 5)).ljust(20)} | {self.ipc_bytes} IPC bytes")
+
+            point_mutation, color_mutation = strategy.mutation_rates
+            self.log.write(f"{last_epoch}, {max}, {min}, {strategy.mutation_factor}, {point_mutation}, {color_mutation}, {self.ipc_bytes}\n")
+
+        if is_due(epoch, generations, self.config["save_frequency"]):
+            with timed("snapshot"):
+                if self.frames:
+                    self.frames.append(last_epoch, best_dna)
+                else:
+                    save_snapshot(self.snapshots, strategy, best_dna, f"{dir}/{last_epoch}.png")
+
+            if self.verbose and getattr(strategy, "screening", None):
+                print(strategy.screening.report())
+
+        if is_due(epoch, generations, CHECKPOINT_FREQUENCY):
+            with timed("checkpoint"):
+                strategy.save_checkpoint(dir, last_epoch)
+
+        if profiler:
+            profiler.dump_stats(f"{dir}/profile_{last_epoch}.prof")
+
+        seconds = time.perf_counter() - epoch_start
+
+        if self.timings_log:
+            self.timings_log.write(json.dumps({"epoch": last_epoch, "seconds": seconds, **timings.collect()}) + "\n")
+
+        self.epoch += generations
+        self.seconds += seconds
+        self.best_dna = best_dna
+        self.max = max
+
+    def close(self):
+        self.stack.close()
+
+        if self.snapshots.dropped:
+            print(f"{self.snapshots.dropped} snapshots dropped")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def run(config, resume=None):
+    start = time.time()
+
+    if resume:
+        # A resumed run continues with the config it was started with
+        with open(resume + "/metadata.json") as file:
+            config = json.load(file)["config"]
+
+    experiment = Experiment(config)
+    # Before anything forks workers
+    timings.enabled = experiment.config["timings"]
+
+    strategy, runtime = create_strategy(experiment)
+
+    startup = {"imports": import_time, **experiment.timings, "total": import_time + time.time() - start}
+
+    print("Startup: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in startup.items()))
+
+    epoch = 0
+
+    if resume:
+        dir = resume
+        checkpoint = load_checkpoint(dir, strategy.dna_class)
+        strategy.resume(checkpoint)
+        epoch = checkpoint["epoch"] + 1
+        truncate_log(dir, checkpoint["epoch"])
+    else:
+        dir = create_dir_name(experiment.config["name"])
+        create_run_dir(dir, experiment, startup)
+
+    # Single parents with delta evaluation evaluate their children in the master, workers would only idle
+    if runtime is None and getattr(strategy, "evaluator", None) is None:
+        runtime = EvaluationPool(experiment.config["workers"], experiment.config["shared_population"])
+
+    with ExitStack() as stack:
+        if runtime is not None:
+            stack.enter_context(runtime)
+
+        current = stack.enter_context(Run(experiment, strategy, runtime, dir, epoch))
+
+        while not current.done:
+            current.run_epoch()
+
+    return current.best_dna
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    run(load_config(arguments.config), arguments.resume)
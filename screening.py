@@ -0,0 +1,89 @@
+import numpy as np
+
+from base_classes import RNG
+
+"""
+    - Pre-screening of the children of a single parent on a fixed subset of the reference pixels
+    - The subset is every stride-th pixel in both directions from a random phase, rendered directly at that resolution,
+      so a screened child costs about 1 / stride ** 2 of a full evaluation
+    - Only children with an estimate within margin (relative) of the estimate of the elite are evaluated fully,
+      the others keep the fitness of the elite plus their extrapolated difference to it
+    - A share of the rejected children is evaluated fully anyway, to count how many of them would have beaten the elite
+    - Children of solved color DNA are screened with the colors of their parent, before solving
+"""
+
+class ScreeningEvaluator:
+    def __init__(self, reference, kernel, stride=3, margin=0.0001, audit=0.05):
+        self.stride = stride
+        self.full_reference = reference
+        self.kernel = kernel
+        self.margin = margin
+        self.audit = audit
+
+        self.elite = None
+        self.elite_estimate = 0
+
+        self.set_phase(tuple(int(value) for value in RNG.integers(stride, size=2)))
+
+        self.screened = 0
+        self.rejected = 0
+        self.audited = 0
+        self.false_rejections = 0
+
+    def set_phase(self, phase):
+        # A resumed run screens on the pixels it was screening on before
+        self.phase = tuple(phase)
+        x, y = self.phase
+        self.reference = np.ascontiguousarray(self.full_reference[y::self.stride, x::self.stride])
+        # Full pixels per screened pixel
+        self.scale = self.full_reference.shape[0] * self.full_reference.shape[1] / (
+            self.reference.shape[0] * self.reference.shape[1]
+        )
+        self.elite = None
+
+    def estimate(self, dna):
+        return self.kernel.score(self.reference, dna.render_subsample(self.stride, self.phase))
+
+    def screen(self, elite, children):
+        # Returns the children worth a full evaluation and the rejected children picked for auditing
+        if elite is not self.elite:
+            self.elite = elite
+            self.elite_estimate = self.estimate(elite)
+
+        threshold = self.elite_estimate - self.margin * abs(self.elite_estimate)
+        passed, audited = [], []
+
+        for dna in children:
+            estimate = self.estimate(dna)
+            self.screened += 1
+
+            if estimate > threshold:
+                passed.append(dna)
+                continue
+
+            self.rejected += 1
+            dna.fitness = elite.fitness + (estimate - self.elite_estimate) * self.scale
+
+            if RNG.random() < self.audit:
+                audited.append(dna)
+
+        return passed, audited
+
+    def record_audit(self, audited, fitness):
+        # Audited children were evaluated fully, so they compete with their real fitness
+        self.audited += len(audited)
+        self.false_rejections += sum(value > self.elite.fitness for value in fitness)
+
+    @property
+    def rejection_rate(self):
+        return self.rejected / max(self.screened, 1)
+
+    @property
+    def false_rejection_rate(self):
+        return self.false_rejections / max(self.audited, 1)
+
+    def report(self):
+        return (
+            f"Screening: {self.rejection_rate * 100:.1f}% of {self.screened} children rejected, "
+            f"{self.false_rejection_rate * 100:.1f}% of {self.audited} audited rejections would have beaten the elite"
+        )
@@ -0,0 +1,69 @@
+import numpy as np
+
+from base_classes import RNG
+
+"""
+    - Parent selection for multi parent populations, all pairs of a generation are drawn in one vectorized call
+    - "roulette" picks in proportion to the weights the gene pool used to have (1 - 1000 copies scaled between min and max)
+    - "rank" picks in proportion to the rank of the fitness, "tournament" takes the best of tournament_size random DNA
+    - The dad is never the mom, roulette skips the weight of the mom on its cumulative sums instead of rebuilding them
+"""
+
+SELECTIONS = ("roulette", "rank", "tournament")
+TOURNAMENT_SIZE = 3
+# Copies the best DNA had in the gene pool, the worst has one
+RESOLUTION = 1000
+
+def get_roulette_weights(fitness):
+    max, min = fitness.max(), fitness.min()
+
+    if max == min:
+        min -= 0.001
+
+    return np.floor(1 + (RESOLUTION - 1) / (max - min) * (fitness - min))
+
+def get_rank_weights(fitness):
+    return np.argsort(np.argsort(fitness, kind="stable")) + 1.0
+
+def draw_weighted(weights, count):
+    cumulative = np.cumsum(weights)
+    moms = np.searchsorted(cumulative, RNG.random(count) * cumulative[-1], side="right")
+
+    # A point on the sums without the weight of the mom, moved over the span of the mom
+    start = cumulative[moms] - weights[moms]
+    point = RNG.random(count) * (cumulative[-1] - weights[moms])
+    point = np.where(point >= start, point + weights[moms], point)
+    dads = np.searchsorted(cumulative, point, side="right")
+
+    # Rounding can put a point on the very end of the sums
+    return np.minimum(moms, len(weights) - 1), np.minimum(dads, len(weights) - 1)
+
+def select_best(fitness, candidates):
+    return candidates[np.arange(len(candidates)), np.argmax(fitness[candidates], axis=1)]
+
+def draw_tournament(fitness, count, size=TOURNAMENT_SIZE):
+    amount = len(fitness)
+    size = min(size, amount - 1)
+
+    moms = select_best(fitness, RNG.integers(amount, size=(count, size)))
+
+    # Drawn from the others by skipping the index of the mom
+    candidates = RNG.integers(amount - 1, size=(count, size))
+    candidates += candidates >= moms[:, None]
+
+    return moms, select_best(fitness, candidates)
+
+def select_parents(method, fitness, count, tournament_size=TOURNAMENT_SIZE):
+    # Indices of count moms and dads into fitness
+    fitness = np.asarray(fitness, dtype=np.float64)
+
+    if method == "roulette":
+        return draw_weighted(get_roulette_weights(fitness), count)
+
+    if method == "rank":
+        return draw_weighted(get_rank_weights(fitness), count)
+
+    if method == "tournament":
+        return draw_tournament(fitness, count, tournament_size)
+
+    raise ValueError(f"Unknown selection {method}")
@@ -0,0 +1,77 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+"""
+    - Genomes of a population in shared memory, as fixed layout offset, color and fitness arrays
+    - The master copies the children into slots, workers evaluate the slots in place and write their fitness back
+    - Tasks only carry the name of the buffer and a range of slots, nothing of the DNA is pickled per epoch
+"""
+
+class SharedPopulation:
+    def __init__(self, dna_class, capacity, name=None):
+        self.dna_class = dna_class
+        self.capacity = capacity
+
+        points_count = dna_class.grid.points_count
+        triangle_count = dna_class.grid.triangle_count
+
+        self.layout = [
+            ("offsets", (capacity, points_count, 2), np.float32),
+            ("colors", (capacity, triangle_count, 3), np.uint8),
+            ("fitness", (capacity,), np.float64)
+        ]
+
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in self.layout)
+
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            # Workers share the resource tracker of the master, which only unlinks the buffer if the master doesn't
+            self.owner = False
+
+        position = 0
+
+        for key, shape, dtype in self.layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=position)
+            setattr(self, key, array)
+            position += array.nbytes
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def write(self, population):
+        for slot, dna in enumerate(population):
+            self.offsets[slot] = dna.offsets
+            self.colors[slot] = dna.colors
+
+    def read(self, start, stop):
+        # DNA viewing their slots, nothing is copied
+        return [self.dna_class(self.offsets[slot], self.colors[slot]) for slot in range(start, stop)]
+
+    def close(self):
+        # Views into the buffer have to be gone before it can be closed
+        for key, _, _ in self.layout:
+            setattr(self, key, None)
+
+        self.memory.close()
+
+        if self.owner:
+            self.memory.unlink()
+
+# Buffer a worker is attached to for every DNA class, replaced when the master grows it
+attached = {}
+
+def attach(name, dna_class, capacity):
+    buffer = attached.get(dna_class)
+
+    if buffer is None or buffer.name != name:
+        if buffer is not None:
+            buffer.close()
+
+        attached[dna_class] = SharedPopulation(dna_class, capacity, name)
+
+    return attached[dna_class]
@@ -3,18 +3,25 @@ from multiprocessing import Process, Queue
 
 import aggdraw
 import numpy as np
-import random
 import os
 from datetime import datetime
 import copy
 
-from base_classes import BaseUtils, create_dir_name, save_metadata, Point
+from base_classes import BaseUtils, create_dir_name, save_metadata
 
-from single_parent_static_mutation_color_array import PopulationColorArray, DNAColorArray, utils
+from single_parent_static_mutation_color_array import PopulationColorArray, DNAColorArray, POINT_MUTATION, COLOR_MUTATION, utils, ERROR_TARGETING
+from evaluation_pool import EvaluationPool
+from label_map import get_triangle_errors
+from checkpoint import CHECKPOINT_FREQUENCY, parse_arguments, save_checkpoint, load_checkpoint, truncate_log
+from writers import LogWriter, SnapshotWriter
+from frames import open_frames
+from mutation_control import SuccessRule
+
+import operators
 
 """
     - New DNA is created from one parent
-    - Mutation Rate for Colors and Points is equal and static
+    - Mutation rates for points and colors are adapted separately with the 1/5th success rule, see mutation_control.py
     - Colors are picked random from all colors existing in the original image
 """
 
@@ -22,9 +29,10 @@ NAME = "single_parent_dynamic_mutation_max_mutations_color_array"
 DIR = create_dir_name(NAME)
 
 SAVE_BEST_DNA_FREQUENCY = 50
+# Snapshots go to frames.bin as genomes instead of PNGs, see frames.py
+STREAM_FRAMES = False
 
 reference, IMAGE_SIZE, colors = BaseUtils.get_image_values("../mona_lisa.jpg")
-reference_r, reference_g, reference_b = reference
 
 POINTS_AMOUNT = 20
 MAX_MUTATIONS = 20
@@ -34,59 +42,74 @@ distance_between_points = BaseUtils.get_distance_between_points(POINTS_AMOUNT, I
 
 TRIANGLE_AMOUNT = (POINTS_AMOUNT - 1) * 2 * (POINTS_AMOUNT - 1)
 
-def new_crossover(mom, mutation_props):
-    mutations = 0
-
-    new_points = copy.deepcopy(mom.points)
-    
-    for i in range(len(new_points)):
-        if random.random() < mutation_props and mutations < MAX_MUTATIONS:
-            mutations += 1
-            new_points[random.randint(0, len(new_points) - 1)].mutate()
-
-    new_colors = copy.deepcopy(mom.colors)
-
-    for i in range(len(new_colors)):
-        if random.random() < mutation_props and mutations < MAX_MUTATIONS:
-            mutations += 1
-            new_colors[random.randint(0, len(new_colors) - 1)] = tuple(utils.generate_color())
-
-    return DNAColorArray(new_points, new_colors)
+def new_crossover(mom, mutation_rates):
+    return operators.mutate(mom, *mutation_rates, MAX_MUTATIONS)
 
 DNAColorArray.crossover = new_crossover
 
 if __name__ == "__main__":
-    population = PopulationColorArray(mutation_rate=random.random())
+    arguments = parse_arguments()
+    controller = SuccessRule(POINT_MUTATION, COLOR_MUTATION)
+    population = PopulationColorArray(mutation_rate=controller.rates)
     epoch = 0
     best_dna = None
 
-    os.mkdir(DIR)
-
-    save_metadata(DIR, {
-        "mutation_rate": "dynamic",
-        "points_amount": {
-            "x": POINTS_AMOUNT,
-            "y": POINTS_AMOUNT
-        },
-        "description": [
-            "Single parent",
-            "Dynamic mutation Rate",
-            "Max amount of mutations per generation",
-            "Pick color random from color array containing all colors of image"
-        ]
-    })
-
-    while True:
-        population = PopulationColorArray(best_dna, random.random())
-        best_dna, max, min = population.run_epoch()
-
-        print(f"{str(epoch).ljust(10)} | {str(round(max, 5)).ljust(20)} | {str(round(min, 5)).ljust(20)}")
-
-        with open(DIR + "/log.csv", "a") as file:
-            file.write(f"{epoch}, {max}, {min}, {population.mutation_rule}\n")
-
-        if epoch % SAVE_BEST_DNA_FREQUENCY == 0:
-            best_dna.draw().save(f"{DIR}/{epoch}.png")
-
-        epoch += 1
+    print(f"DNA size: {population.population[0].nbytes()} bytes")
+
+    if arguments.resume:
+        DIR = arguments.resume
+        checkpoint = load_checkpoint(DIR, DNAColorArray)
+        best_dna = checkpoint["best_dna"]
+        epoch = checkpoint["epoch"] + 1
+        controller = SuccessRule(checkpoint["point_mutation"], checkpoint["color_mutation"])
+        truncate_log(DIR, checkpoint["epoch"])
+
+        if ERROR_TARGETING:
+            best_dna.errors = get_triangle_errors(best_dna)
+    else:
+        os.mkdir(DIR)
+
+        save_metadata(DIR, {
+            "dna_bytes": population.population[0].nbytes(),
+            "mutation_rate": "1/5th success rule",
+            "points_amount": {
+                "x": POINTS_AMOUNT,
+                "y": POINTS_AMOUNT
+            },
+            "description": [
+                "Single parent",
+                "Point and color mutation rate adapted with the 1/5th success rule",
+                "Max amount of mutations per generation",
+                "Pick color random from color array containing all colors of image"
+            ]
+        })
+
+    with (
+        EvaluationPool() as pool, LogWriter(DIR + "/log.csv") as log, SnapshotWriter() as snapshots,
+        open_frames(DIR, STREAM_FRAMES) as frames
+    ):
+        while True:
+            population = PopulationColorArray(best_dna, tuple(controller.rates), pool)
+            parent = best_dna
+            best_dna, max, min = population.run_epoch()
+
+            if parent is not None:
+                controller.update(parent, population.population)
+
+            print(f"{str(epoch).ljust(10)} | {str(round(max, 5)).ljust(20)} | {str(round(min, 5)).ljust(20)}")
+
+            log.write(f"{epoch}, {max}, {min}, {controller.point_mutation}, {controller.color_mutation}\n")
+
+            if epoch % SAVE_BEST_DNA_FREQUENCY == 0:
+                if frames:
+                    frames.append(epoch, best_dna)
+                else:
+                    snapshots.save_dna(best_dna, f"{DIR}/{epoch}.png")
+
+            if epoch % CHECKPOINT_FREQUENCY == 0:
+                save_checkpoint(
+                    DIR, epoch, best_dna, point_mutation=controller.point_mutation, color_mutation=controller.color_mutation
+                )
+
+            epoch += 1
         
\ No newline at end of file
@@ -8,9 +8,19 @@ import os
 from datetime import datetime
 import copy
 
-from base_classes import BaseUtils, PROCESSING, create_dir_name, save_metadata, Point
+from base_classes import BaseUtils, PaletteUtils, PROCESSING, create_dir_name, save_metadata, Grid
 
 from single_parent_static_mutation_random_color import Population, DNA
+from evaluation_pool import EvaluationPool
+from delta_evaluation import DeltaEvaluator
+from fitness_kernels import KERNELS
+from label_map import get_triangle_errors
+from quantization import get_palette
+from checkpoint import CHECKPOINT_FREQUENCY, parse_arguments, save_checkpoint, load_checkpoint, truncate_log
+from writers import LogWriter, SnapshotWriter
+from frames import open_frames
+
+import operators
 
 """
     - New DNA is created from one parent
@@ -22,137 +32,121 @@ NAME = "single_parent_static_mutation_reduced_color_array"
 DIR = create_dir_name(NAME)
 
 SAVE_BEST_DNA_FREQUENCY = 1000
+# Snapshots go to frames.bin as genomes instead of PNGs, see frames.py
+STREAM_FRAMES = False
 
 reference, IMAGE_SIZE, colors = BaseUtils.get_image_values("../mona_lisa.jpg")
-reference_r, reference_g, reference_b = reference
 
 POINTS_AMOUNT = 50
 
-# Tuple x, y
-distance_between_points = BaseUtils.get_distance_between_points(POINTS_AMOUNT, IMAGE_SIZE)
-
-TRIANGLE_AMOUNT = (POINTS_AMOUNT - 1) * 2 * (POINTS_AMOUNT - 1)
+GRID = Grid(POINTS_AMOUNT, IMAGE_SIZE)
 
 POINT_MUTATION = 0.005
 COLOR_MUTATION = 0.0003
 
-def new_fitness_func(ref_data, data):
-    return np.maximum(np.sum(8000 * np.power(1.06, -np.abs(ref_data - data)) - 1), 0) * 0.000001
-
-BaseUtils.fitness_func = new_fitness_func
+DELTA_EVALUATION = True
 
-colors = BaseUtils.reduce_color_amount(colors)
+# Mutations pick triangles and points in proportion to their error in the parent
+ERROR_TARGETING = True
 
-class Utils(BaseUtils):
-    def __init__(self, colors, points_amount):
-        super().__init__(colors, points_amount)
+# Cached next to the image after the first run
+colors = get_palette("../mona_lisa.jpg", reference, "gradient")
 
-    def generate_color(self):
-        return random.choice(colors)
-
-utils = Utils(colors, POINTS_AMOUNT)
+utils = PaletteUtils(colors, POINTS_AMOUNT)
 
 class DNAColorArray(DNA):
-    def __init__(self, dna=None, color=None):
-        self.fitness = 0
-        self.points = []
-        self.colors = []
-
-        if dna and color:
-            self.points = dna
-            self.colors = color
-            return
-
-        for i in range(POINTS_AMOUNT * POINTS_AMOUNT):
-            p = Point(i, POINTS_AMOUNT, distance_between_points)
-            # p.mutate()
-
-            self.points.append(p)
-
-        for i in range(TRIANGLE_AMOUNT):
-            self.colors.append(tuple(utils.generate_color()))
+    kernel = KERNELS["steep_penalty"]
+    grid = GRID
+    utils = utils
 
     @staticmethod
     def crossover(mom, mutation_propabilities):
-        p_mutations = 0
-        c_mutations = 0
-
-        new_points = copy.deepcopy(mom.points)
-        
-        for _ in range(len(new_points)):
-            if random.random() < POINT_MUTATION:
-                p_mutations += 1
-                new_points[random.randint(0, len(new_points) - 1)].mutate()
-
-        new_colors = copy.deepcopy(mom.colors)
-
-        for _ in range(len(new_colors)):
-            if random.random() < COLOR_MUTATION:
-                c_mutations += 1
-                new_colors[random.randint(0, len(new_colors) - 1)] = tuple(utils.generate_color())
-
-        # print("MUTATED", p_mutations, c_mutations)
-
-        return DNAColorArray(new_points, new_colors)
+        return operators.mutate(mom, POINT_MUTATION, COLOR_MUTATION)
 
 class PopulationColorArray(Population):
-    def __init__(self, best_dna=None, mutation_rate=POINT_MUTATION):
-        super().__init__(best_dna, mutation_rate)
-
-        if best_dna == None:
-            self.population = [DNAColorArray() for _ in range(PROCESSING)]
-
-    def generate_new_population(self, best_dna):
-        new_population = []
-
-        for _ in range(len(self.population) - 1):
-            new_population.append(DNAColorArray.crossover(best_dna, self.mutation_rule))
-
-        new_population.append(best_dna)
+    dna_class = DNAColorArray
+    elitism = True
+    error_targeting = ERROR_TARGETING
 
-        self.population = new_population
+    def __init__(self, best_dna=None, mutation_rate=POINT_MUTATION, pool=None, evaluator=None):
+        super().__init__(best_dna, mutation_rate, pool, evaluator)
 
 
 if __name__ == "__main__":
+    arguments = parse_arguments()
     population = PopulationColorArray()
     epoch = 0
     best_dna = None
     all_time_best = 0
 
-    os.mkdir(DIR)
-
-    save_metadata(DIR, {
-        "mutation": {
-            "point": POINT_MUTATION,
-            "color": COLOR_MUTATION
-        },
-        "points_amount": {
-            "x": POINTS_AMOUNT,
-            "y": POINTS_AMOUNT
-        },
-        "description": [
-            "Single parent",
-            "New fitness function",
-            "Static mutation Rate",
-            "Pick color random from color array containing all colors of image"
-        ]
-    })
-
-    while True:
-        population = PopulationColorArray(best_dna)
-        best_dna, max, min = population.run_epoch()
-
-        if max > all_time_best + 50:
-            all_time_best = max
-            best_dna.draw().save(f"{DIR}/{epoch}_{max}.png")
-
-        print(f"{str(epoch).ljust(10)} | {str(round(max, 5)).ljust(20)} | {str(round(min, 5)).ljust(20)}")
-
-        with open(DIR + "/log.csv", "a") as file:
-            file.write(f"{epoch}, {max}, {min}\n")
-
-        if epoch % SAVE_BEST_DNA_FREQUENCY == 0:
-            best_dna.draw().save(f"{DIR}/{epoch}.png")
-
-        epoch += 1
+    print(f"DNA size: {population.population[0].nbytes()} bytes")
+
+    evaluator = None
+
+    if DELTA_EVALUATION:
+        evaluator = DeltaEvaluator(reference, GRID, DNAColorArray.kernel)
+
+    if arguments.resume:
+        DIR = arguments.resume
+        checkpoint = load_checkpoint(DIR, DNAColorArray)
+        best_dna = checkpoint["best_dna"]
+        all_time_best = checkpoint["all_time_best"]
+        epoch = checkpoint["epoch"] + 1
+        truncate_log(DIR, checkpoint["epoch"])
+
+        if evaluator:
+            evaluator.set_parent(best_dna)
+
+        if ERROR_TARGETING:
+            best_dna.errors = get_triangle_errors(best_dna, evaluator)
+    else:
+        os.mkdir(DIR)
+
+        save_metadata(DIR, {
+            "dna_bytes": population.population[0].nbytes(),
+            "mutation": {
+                "point": POINT_MUTATION,
+                "color": COLOR_MUTATION
+            },
+            "points_amount": {
+                "x": POINTS_AMOUNT,
+                "y": POINTS_AMOUNT
+            },
+            "description": [
+                "Single parent",
+                "New fitness function",
+                "Static mutation Rate",
+                "Pick color random from color array containing all colors of image"
+            ]
+        })
+
+    with (
+        EvaluationPool() as pool, LogWriter(DIR + "/log.csv") as log, SnapshotWriter() as snapshots,
+        open_frames(DIR, STREAM_FRAMES) as frames
+    ):
+        while True:
+            population = PopulationColorArray(best_dna, pool=pool, evaluator=evaluator)
+            best_dna, max, min = population.run_epoch()
+
+            if max > all_time_best + 50:
+                all_time_best = max
+                if frames:
+                    frames.append(epoch, best_dna)
+                else:
+                    snapshots.save_dna(best_dna, f"{DIR}/{epoch}_{max}.png")
+
+            print(f"{str(epoch).ljust(10)} | {str(round(max, 5)).ljust(20)} | {str(round(min, 5)).ljust(20)}")
+
+            log.write(f"{epoch}, {max}, {min}\n")
+
+            if epoch % SAVE_BEST_DNA_FREQUENCY == 0:
+                if frames:
+                    frames.append(epoch, best_dna)
+                else:
+                    snapshots.save_dna(best_dna, f"{DIR}/{epoch}.png")
+
+            if epoch % CHECKPOINT_FREQUENCY == 0:
+                save_checkpoint(DIR, epoch, best_dna, all_time_best=all_time_best)
+
+            epoch += 1
         
\ No newline at end of file
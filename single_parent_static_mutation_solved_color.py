@@ -0,0 +1,120 @@
+from PIL import Image, ImageDraw
+
+import aggdraw
+import numpy as np
+import random
+import os
+from datetime import datetime
+import copy
+
+from base_classes import BaseUtils, PROCESSING, RENDER_BACKEND, create_dir_name, save_metadata, Grid
+
+from evaluation_pool import EvaluationPool
+from checkpoint import CHECKPOINT_FREQUENCY, parse_arguments, save_checkpoint, load_checkpoint, truncate_log
+from writers import LogWriter, SnapshotWriter
+from frames import open_frames
+from color_solver import ColorSolver, SolvedColorDNA, SolvedColorPopulation
+from fitness_kernels import KERNELS
+
+"""
+    - New DNA is created from one parent
+    - Only points are mutated, with a static mutation rate
+    - Colors are not searched, the best color of every triangle is solved from the reference pixels it covers
+"""
+
+NAME = "single_parent_static_mutation_solved_color"
+DIR = create_dir_name(NAME)
+
+SAVE_BEST_DNA_FREQUENCY = 100
+# Snapshots go to frames.bin as genomes instead of PNGs, see frames.py
+STREAM_FRAMES = False
+
+reference, IMAGE_SIZE, colors = BaseUtils.get_image_values("../mona_lisa.jpg")
+
+POINTS_AMOUNT = 50
+
+GRID = Grid(POINTS_AMOUNT, IMAGE_SIZE)
+
+POINT_MUTATION = 0.005
+
+# "optimal" for the kernel or "mean" of the covered pixels
+COLOR_SOLVE = "optimal"
+
+KERNEL = KERNELS["steep_penalty"]
+
+solver = ColorSolver(reference, GRID, KERNEL, COLOR_SOLVE)
+
+# Only used for the colors of the first DNA, before they are solved
+utils = BaseUtils(colors, POINTS_AMOUNT)
+
+class DNASolvedColor(SolvedColorDNA):
+    reference = reference
+    kernel = KERNEL
+    grid = GRID
+    utils = utils
+    solver = solver
+
+class PopulationSolvedColor(SolvedColorPopulation):
+    dna_class = DNASolvedColor
+
+    def __init__(self, best_dna=None, mutation_rate=POINT_MUTATION, pool=None):
+        super().__init__(best_dna, mutation_rate, pool)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    population = PopulationSolvedColor()
+    epoch = 0
+    best_dna = None
+
+    print(f"DNA size: {population.population[0].nbytes()} bytes")
+
+    if arguments.resume:
+        DIR = arguments.resume
+        checkpoint = load_checkpoint(DIR, DNASolvedColor)
+        best_dna = checkpoint["best_dna"]
+        epoch = checkpoint["epoch"] + 1
+        truncate_log(DIR, checkpoint["epoch"])
+    else:
+        os.mkdir(DIR)
+
+        save_metadata(DIR, {
+            "dna_bytes": population.population[0].nbytes(),
+            "mutation": {
+                "point": POINT_MUTATION,
+                "color": COLOR_SOLVE
+            },
+            "points_amount": {
+                "x": POINTS_AMOUNT,
+                "y": POINTS_AMOUNT
+            },
+            "description": [
+                "Single parent",
+                "Static mutation Rate",
+                "Only points are mutated",
+                "Colors solved per triangle from the covered reference pixels"
+            ]
+        })
+
+    with (
+        EvaluationPool() as pool, LogWriter(DIR + "/log.csv") as log, SnapshotWriter() as snapshots,
+        open_frames(DIR, STREAM_FRAMES) as frames
+    ):
+        while True:
+            population = PopulationSolvedColor(best_dna, pool=pool)
+            best_dna, max, min = population.run_epoch()
+
+            print(f"{str(epoch).ljust(10)} | {str(round(max, 5)).ljust(20)} | {str(round(min, 5)).ljust(20)}")
+
+            log.write(f"{epoch}, {max}, {min}\n")
+
+            if epoch % SAVE_BEST_DNA_FREQUENCY == 0:
+                if frames:
+                    frames.append(epoch, best_dna)
+                else:
+                    snapshots.save_dna(best_dna, f"{DIR}/{epoch}.png")
+
+            if epoch % CHECKPOINT_FREQUENCY == 0:
+                save_checkpoint(DIR, epoch, best_dna)
+
+            epoch += 1
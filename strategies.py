@@ -0,0 +1,260 @@
+import random
+
+from checkpoint import save_checkpoint
+from color_solver import ColorSolver, SolvedColorDNA, SolvedColorPopulation
+from delta_evaluation import DeltaEvaluator
+from genome import DNA, Population, MultiParentPopulation
+from label_map import get_triangle_errors
+from mutation_control import SuccessRule
+from screening import ScreeningEvaluator
+
+import operators
+
+"""
+    - The experiments of the single scripts as strategies of the runner, bound to an Experiment instead of module globals
+    - DNA classes live at module level so the pool can pickle them, binding sets their class attributes before it forks
+    - A strategy keeps the state of a run between epochs and knows what goes into its checkpoint
+"""
+
+class SingleParentDNA(DNA):
+    point_mutation = 0
+    color_mutation = 0
+    max_mutations = None
+
+    @staticmethod
+    def crossover(mom, mutation_factor):
+        return operators.mutate(
+            mom, SingleParentDNA.point_mutation * mutation_factor,
+            SingleParentDNA.color_mutation * mutation_factor, SingleParentDNA.max_mutations
+        )
+
+class SingleParentPopulation(Population):
+    dna_class = SingleParentDNA
+    elitism = True
+
+class MultiParentDNA(DNA):
+    point_mutation = 0
+    color_mutation = 0
+
+    @staticmethod
+    def crossover(mom, dad, mutation_factor):
+        return operators.uniform_crossover(
+            mom, dad, MultiParentDNA.point_mutation * mutation_factor, MultiParentDNA.color_mutation * mutation_factor
+        )
+
+class MultiParentPopulationStrategy(MultiParentPopulation):
+    dna_class = MultiParentDNA
+
+class SolvedDNA(SolvedColorDNA):
+    point_mutation = 0
+
+    @staticmethod
+    def crossover(mom, mutation_factor):
+        return operators.mutate(mom, SolvedDNA.point_mutation * mutation_factor, 0)
+
+class SolvedPopulation(SolvedColorPopulation):
+    dna_class = SolvedDNA
+
+def bind(dna_class, experiment):
+    config = experiment.config
+
+    dna_class.reference = experiment.reference
+    dna_class.kernel = experiment.kernel
+    dna_class.grid = experiment.grid
+    dna_class.utils = experiment.utils
+    dna_class.point_mutation = config["point_mutation"]
+    dna_class.color_mutation = config["color_mutation"]
+    dna_class.max_mutations = config["max_mutations"]
+
+def copy_migrant(migrant):
+    # Drops what a migrant carries from its island, like the serial of its parent there
+    dna = migrant.copy()
+    dna.fitness = migrant.fitness
+
+    return dna
+
+class SingleParent:
+    dna_class = SingleParentDNA
+    population_class = SingleParentPopulation
+    # Children only differ from their parent where they were mutated
+    delta_evaluation = True
+    # Generations run by one call of run_epoch
+    generations = 1
+
+    def __init__(self, experiment):
+        self.experiment = experiment
+        self.config = experiment.config
+        self.pool = None
+        self.best_dna = None
+        self.mutation_factor = 1
+
+        self.evaluator = None
+        self.screening = None
+
+        if self.delta_evaluation and self.config["delta_evaluation"]:
+            self.evaluator = DeltaEvaluator(experiment.reference, experiment.grid, experiment.kernel)
+        elif self.config["screening"]:
+            # Children evaluated with a full render are screened first
+            self.screening = ScreeningEvaluator(
+                experiment.reference, experiment.kernel, self.config["screening"],
+                self.config["screening_margin"], self.config["screening_audit"]
+            )
+
+        self.controller = None
+
+        if self.config["dynamic_mutation"] == "success_rule":
+            self.controller = SuccessRule(self.config["point_mutation"], self.config["color_mutation"])
+
+        self.activate()
+
+    def activate(self):
+        # Class attributes are shared by all strategies of a class, they are set again when another one used them
+        bind(self.dna_class, self.experiment)
+        self.population_class.error_targeting = self.config["error_targeting"]
+        self.population_class.screening = self.screening
+
+    @property
+    def mutation_rates(self):
+        return self.dna_class.point_mutation * self.mutation_factor, self.dna_class.color_mutation * self.mutation_factor
+
+    def run_epoch(self):
+        if self.config["dynamic_mutation"] == "random":
+            self.mutation_factor = random.random()
+
+        if self.controller:
+            self.dna_class.point_mutation, self.dna_class.color_mutation = self.controller.rates
+
+        parent = self.best_dna
+        population = self.population_class(
+            self.best_dna, self.mutation_factor, self.pool, self.evaluator, self.config["population_size"]
+        )
+        self.best_dna, max, min = population.run_epoch()
+
+        if self.controller and parent is not None:
+            self.controller.update(parent, population.population)
+
+        return self.best_dna, max, min
+
+    def save_checkpoint(self, dir, epoch, **values):
+        if self.controller:
+            values.update(point_mutation=self.controller.point_mutation, color_mutation=self.controller.color_mutation)
+
+        if self.screening:
+            values.update(screening_phase=self.screening.phase)
+
+        save_checkpoint(dir, epoch, self.best_dna, mutation_rate=self.mutation_factor, **values)
+
+    def add_migrant(self, migrant):
+        # A migrant replaces the parent if it is better
+        if self.best_dna is not None and migrant.fitness <= self.best_dna.fitness:
+            return
+
+        self.best_dna = copy_migrant(migrant)
+
+        if self.evaluator:
+            self.evaluator.set_parent(self.best_dna)
+
+    def resume(self, checkpoint):
+        self.best_dna = checkpoint["best_dna"]
+        self.mutation_factor = checkpoint["mutation_rate"]
+
+        if self.controller and "point_mutation" in checkpoint:
+            self.controller.rates = [checkpoint["point_mutation"], checkpoint["color_mutation"]]
+
+        if self.screening and "screening_phase" in checkpoint:
+            # The phase was drawn from the generators before they were restored
+            self.screening.set_phase(checkpoint["screening_phase"])
+
+        if self.evaluator:
+            self.evaluator.set_parent(self.best_dna)
+
+        if self.population_class.error_targeting:
+            self.best_dna.errors = get_triangle_errors(self.best_dna, self.evaluator)
+
+class SolvedColor(SingleParent):
+    dna_class = SolvedDNA
+    population_class = SolvedPopulation
+
+    # Colors of a child are solved again as a whole
+    delta_evaluation = False
+
+    def __init__(self, experiment):
+        self.solver = ColorSolver(
+            experiment.reference, experiment.grid, experiment.kernel, experiment.config["color_solve"]
+        )
+
+        super().__init__(experiment)
+
+    def activate(self):
+        super().activate()
+        self.dna_class.solver = self.solver
+
+class MultiParent:
+    dna_class = MultiParentDNA
+    generations = 1
+
+    def __init__(self, experiment):
+        self.experiment = experiment
+        self.config = experiment.config
+
+        if self.config["dynamic_mutation"] == "success_rule":
+            raise ValueError("The success rule needs children of a single parent")
+
+        self.activate()
+        self.population = MultiParentPopulationStrategy(1, None, self.config["population_size"])
+
+    def activate(self):
+        bind(self.dna_class, self.experiment)
+        MultiParentPopulationStrategy.selection = self.config["selection"]
+        MultiParentPopulationStrategy.tournament_size = self.config["tournament_size"]
+
+    @property
+    def pool(self):
+        return self.population.pool
+
+    @pool.setter
+    def pool(self, pool):
+        self.population.pool = pool
+
+    @property
+    def mutation_factor(self):
+        return self.population.mutation_rule
+
+    @property
+    def mutation_rates(self):
+        return self.dna_class.point_mutation * self.mutation_factor, self.dna_class.color_mutation * self.mutation_factor
+
+    def run_epoch(self):
+        if self.config["dynamic_mutation"] == "random":
+            self.population.mutation_rule = random.random()
+
+        return self.population.run_epoch()
+
+    def save_checkpoint(self, dir, epoch, **values):
+        save_checkpoint(
+            dir, epoch, self.population.best_dna, self.population.population, self.population.mutation_rule, **values
+        )
+
+    def add_migrant(self, migrant):
+        # A migrant takes the place of a random child of the next generation
+        dna = copy_migrant(migrant)
+        self.population.population[random.randrange(len(self.population.population))] = dna
+
+        if dna.fitness > self.population.best_fitness:
+            self.population.best_dna = dna
+            self.population.best_fitness = dna.fitness
+            self.population.fitness[self.population.size] = dna.fitness
+
+    def resume(self, checkpoint):
+        # The population of the next epoch was already generated when the checkpoint was written
+        self.population.population = checkpoint["population"]
+        self.population.best_dna = checkpoint["best_dna"]
+        self.population.best_fitness = self.population.best_dna.fitness
+        self.population.fitness[self.population.size] = self.population.best_fitness
+        self.population.mutation_rule = checkpoint["mutation_rate"]
+
+STRATEGIES = {
+    "single_parent": SingleParent,
+    "solved_color": SolvedColor,
+    "multi_parent": MultiParent
+}
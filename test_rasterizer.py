@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from base_classes import Grid
+from genome import draw_triangles
+
+import rasterizer
+
+"""
+    - The numpy backend against aggdraw on grids with every point moved
+    - Pixels next to an edge are anti aliased by aggdraw only, the others have to match
+"""
+
+IMAGE_SIZE = (300, 400)
+# Share of pixels away from edges allowed to differ, measured at 0.14 - 0.4%
+MISMATCH_TOLERANCE = 0.01
+
+def random_grid(points_amount, seed):
+    rng = np.random.default_rng(seed)
+    grid = Grid(points_amount, IMAGE_SIZE)
+
+    offsets = grid.clip((rng.random((grid.points_count, 2), dtype=np.float32) - 0.5) * grid.mutation_range)
+    colors = rng.integers(0, 256, (grid.triangle_count, 3), dtype=np.uint8)
+
+    return grid.coords(offsets)[grid.triangles], colors
+
+@pytest.mark.parametrize("points_amount", [5, 20, 50])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_aggdraw_away_from_edges(points_amount, seed):
+    vertices, colors = random_grid(points_amount, seed)
+
+    aggdraw_image = np.asarray(draw_triangles(vertices, colors, IMAGE_SIZE))
+    numpy_image = rasterizer.render(vertices, colors, IMAGE_SIZE)
+    labels = rasterizer.rasterize(vertices, IMAGE_SIZE)
+
+    mismatch, _ = rasterizer.compare(aggdraw_image, numpy_image, labels)
+
+    assert mismatch < MISMATCH_TOLERANCE
+
+def test_covers_the_whole_image():
+    vertices, _ = random_grid(20, 0)
+
+    assert np.all(rasterizer.rasterize(vertices, IMAGE_SIZE) >= 0)
+
+def test_origin_crops_the_full_render():
+    vertices, colors = random_grid(20, 0)
+    full = rasterizer.render(vertices, colors, IMAGE_SIZE)
+
+    region = rasterizer.render(vertices, colors, (70, 50), (120, 200))
+
+    assert np.array_equal(region, full[200:250, 120:190])
@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+import time
+import os
+
+"""
+    - Optional wall time per phase of an epoch, like evaluate, breed, render, score or writing snapshots
+    - Code marks a phase with "with timed(name):", which only reads a flag while timings are disabled
+    - Workers time their own phases and send them back with their results, kept per worker process id
+    - The runner collects the phases of every epoch and writes them to timings.jsonl in the run directory
+    - Workers are forked, so enabled has to be set before the pool is created
+"""
+
+enabled = False
+
+# Seconds per phase and per worker process since the last collect
+phases = defaultdict(float)
+workers = defaultdict(float)
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        if enabled:
+            self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if enabled:
+            phases[self.name] += time.perf_counter() - self.start
+
+# Reused, so marking a phase doesn't create an object
+markers = {}
+
+def timed(name):
+    if name not in markers:
+        markers[name] = Phase(name)
+
+    return markers[name]
+
+def collect():
+    # Phases and workers since the last call, both are reset
+    result = {"phases": dict(phases), "workers": dict(workers)}
+
+    phases.clear()
+    workers.clear()
+
+    return result
+
+def get_worker_result():
+    # What a worker sends back with its results, None while disabled
+    if not enabled:
+        return None
+
+    return os.getpid(), collect()["phases"]
+
+def add_worker_results(results):
+    for result in results:
+        if result is None:
+            continue
+
+        pid, worker_phases = result
+
+        for name, seconds in worker_phases.items():
+            phases["worker." + name] += seconds
+
+        workers[pid] += worker_phases.get("task", 0)
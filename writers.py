@@ -0,0 +1,122 @@
+from collections import deque
+from functools import partial
+from PIL import Image
+
+import threading
+import queue
+import time
+
+import genome
+
+"""
+    - Output of a run written by background threads, so the evolution loop never waits for the disk
+    - LogWriter keeps its file open, batches the lines queued since its last write and flushes every flush_interval
+    - SnapshotWriter encodes PNGs, if more than backlog frames are waiting the oldest ones are dropped
+    - Snapshots are either an already rendered (H, W, 3) array or drawn from the genome by the writer thread
+    - Both are context managers and write everything still queued when they are closed
+"""
+
+FLUSH_INTERVAL = 1
+SNAPSHOT_BACKLOG = 2
+
+class LogWriter:
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        self.file = open(path, "a")
+        self.flush_interval = flush_interval
+        self.lines = queue.SimpleQueue()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, line):
+        self.lines.put(line)
+
+    def run(self):
+        last_flush = time.time()
+        running = True
+
+        while running:
+            batch = []
+
+            try:
+                batch.append(self.lines.get(timeout=self.flush_interval))
+
+                while True:
+                    batch.append(self.lines.get_nowait())
+            except queue.Empty:
+                pass
+
+            # None is queued by close
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                running = False
+
+            self.file.write("".join(batch))
+
+            if time.time() - last_flush >= self.flush_interval:
+                self.file.flush()
+                last_flush = time.time()
+
+        self.file.close()
+
+    def close(self):
+        self.lines.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class SnapshotWriter:
+    def __init__(self, backlog=SNAPSHOT_BACKLOG):
+        self.backlog = backlog
+        self.frames = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def save(self, image, path):
+        # image is an (H, W, 3) uint8 array the caller doesn't change anymore, or a function returning a PIL image
+        with self.condition:
+            if len(self.frames) >= self.backlog:
+                self.frames.popleft()
+                self.dropped += 1
+
+            self.frames.append((image, path))
+            self.condition.notify()
+
+    def save_dna(self, dna, path):
+        # Vertices and colors are taken now, the DNA class may be bound to another grid when the frame is drawn
+        self.save(partial(genome.draw_triangles, dna.coords()[dna.grid.triangles], dna.colors.copy(), dna.grid.image_size), path)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.frames and not self.closed:
+                    self.condition.wait()
+
+                if not self.frames:
+                    return
+
+                image, path = self.frames.popleft()
+
+            image = image() if callable(image) else Image.fromarray(image)
+            image.save(path)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()